@@ -0,0 +1,372 @@
+"""
+Detector Backends for Car Color Detection System
+Every backend turns a list of BGR images into one Detections object per
+image, with boxes in original image coordinates, so the rest of the
+detector does not depend on which inference engine produced them
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+import config
+
+# Pre-filter confidence used when the caller gives none (same as ultralytics)
+DEFAULT_CONFIDENCE = 0.25
+
+# CPU flags (/proc/cpuinfo) of native half-precision arithmetic, x86 then ARM
+HALF_PRECISION_FLAGS = {
+    'fp16': ('avx512_fp16', 'amx_fp16', 'asimdhp'),
+    'bf16': ('avx512_bf16', 'amx_bf16', 'bf16')
+}
+
+
+def cpu_half_precision():
+    """
+    Check which half-precision formats the CPU computes natively
+
+    Returns:
+        Dictionary of 'fp16' and 'bf16' to True/False (both False where
+        /proc/cpuinfo cannot be read)
+    """
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            flags = set()
+            for line in f:
+                if line.startswith(('flags', 'Features')):
+                    flags.update(line.split(':', 1)[1].split())
+    except OSError:
+        flags = set()
+    return {name: any(flag in flags for flag in names) for name, names in HALF_PRECISION_FLAGS.items()}
+
+
+class Detections:
+    """Detections for one image as NumPy arrays"""
+
+    def __init__(self, boxes=None, confidences=None, class_ids=None):
+        self.boxes = np.asarray(boxes if boxes is not None else np.empty((0, 4)), dtype=np.float32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences if confidences is not None else [], dtype=np.float32)
+        self.class_ids = np.asarray(class_ids if class_ids is not None else [], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.boxes)
+
+
+def non_max_suppression(boxes, scores, class_ids, iou_threshold):
+    """
+    Greedy per-class non-maximum suppression
+
+    Boxes of different classes are shifted apart by a per-class offset so a
+    single pass never suppresses across classes.
+
+    Returns:
+        Indices of the boxes to keep, highest score first
+    """
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    offsets = class_ids.astype(np.float32)[:, None] * (boxes.max() + 1)
+    shifted = boxes + offsets
+    areas = (shifted[:, 2] - shifted[:, 0]) * (shifted[:, 3] - shifted[:, 1])
+
+    order = np.argsort(scores)[::-1]
+    keep = []
+    while len(order):
+        best, rest = order[0], order[1:]
+        keep.append(best)
+
+        inter_w = np.clip(np.minimum(shifted[best, 2], shifted[rest, 2]) - np.maximum(shifted[best, 0], shifted[rest, 0]), 0, None)
+        inter_h = np.clip(np.minimum(shifted[best, 3], shifted[rest, 3]) - np.maximum(shifted[best, 1], shifted[rest, 1]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / np.maximum(areas[best] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+class DetectorBackend:
+    """Base class for inference backends"""
+
+    name = 'base'
+
+    def __init__(self):
+        self._loaded = False
+        self._lock = threading.Lock()
+
+        # Models cannot run two forward passes at once, so threads sharing a backend take turns
+        self._inference_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def load(self):
+        """Load the model if it is not loaded yet"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+
+    def detect(self, images, conf=None, classes=None, input_size=None):
+        """
+        Detect objects in a list of BGR images
+
+        Args:
+            images: List of BGR images
+            conf: Minimum confidence (None for DEFAULT_CONFIDENCE)
+            classes: Class IDs to keep (None for all)
+            input_size: Model input size for this call, a multiple of 32
+                        (None for the backend's own; ignored by fixed-size models)
+
+        Returns:
+            List of Detections, one per image
+        """
+        self.load()
+        with self._inference_lock:
+            return self._detect(list(images), DEFAULT_CONFIDENCE if conf is None else conf, classes, input_size)
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _detect(self, images, conf, classes, input_size):
+        raise NotImplementedError
+
+
+class UltralyticsBackend(DetectorBackend):
+    """PyTorch YOLO through the ultralytics package"""
+
+    name = 'ultralytics'
+
+    def __init__(self, model_path=None, input_size=None, precision=None):
+        super().__init__()
+        self.model_path = model_path or config.YOLO_MODEL
+        self.input_size = input_size or config.INFERENCE_SIZE
+        self.device = 'cuda' if config.ENABLE_GPU else 'cpu'
+        self.precision = precision or config.TORCH_PRECISION
+        self.model = None
+
+    def _load(self):
+        from ultralytics import YOLO
+        self.model = YOLO(self.model_path)  # Will download if not present
+
+        if self.precision == 'fp16' and self.device == 'cpu':
+            print("Warning: fp16 needs the GPU with PyTorch, running in fp32 on the CPU")
+            self.precision = 'fp32'
+        elif self.precision == 'bf16' and self.device == 'cpu' and not cpu_half_precision()['bf16']:
+            print("Warning: this CPU has no native bfloat16, bf16 inference will be emulated and slow")
+
+    def _detect(self, images, conf, classes, input_size):
+        kwargs = dict(conf=conf, iou=config.NMS_IOU_THRESHOLD, classes=classes, imgsz=input_size or self.input_size,
+                      device=self.device, half=self.precision == 'fp16', verbose=False)
+        if self.precision == 'bf16':
+            import torch
+            with torch.autocast(self.device, dtype=torch.bfloat16):
+                results = self.model(images, **kwargs)
+        else:
+            results = self.model(images, **kwargs)
+
+        detections = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                detections.append(Detections())
+            else:
+                detections.append(Detections(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(),
+                                             boxes.cls.cpu().numpy()))
+        return detections
+
+
+class OnnxRuntimeBackend(DetectorBackend):
+    """YOLOv8 exported to ONNX, run with ONNX Runtime on the CPU
+
+    Export the model once with: yolo export model=yolov8n.pt format=onnx
+    Letterbox preprocessing, output decoding and NMS are done here in NumPy.
+    INT8 and FP16 models made by quantize.py take the same float32 input.
+    """
+
+    name = 'onnxruntime'
+
+    def __init__(self, model_path=None, input_size=None):
+        super().__init__()
+        self.model_path = model_path or config.ONNX_MODEL
+        self.input_size = input_size or config.INFERENCE_SIZE
+        self.session = None
+        self.input_name = None
+        self.fixed_batch = None
+        self.fixed_size = False
+
+    def _load(self):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise ImportError("The onnxruntime backend needs the onnxruntime package: pip install onnxruntime")
+
+        options = onnxruntime.SessionOptions()
+        if config.ONNX_THREADS:
+            options.intra_op_num_threads = config.ONNX_THREADS
+        self.session = onnxruntime.InferenceSession(self.model_path, options,
+                                                    providers=['CPUExecutionProvider'])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_dim, _, height, _ = model_input.shape
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+        if isinstance(height, int):
+            self.input_size = height
+            self.fixed_size = True
+
+    def letterbox(self, image, size=None):
+        """
+        Resize keeping aspect ratio and pad to a square input
+
+        Returns:
+            tuple: (padded BGR image, scale, (pad_x, pad_y))
+        """
+        size = size or self.input_size
+        height, width = image.shape[:2]
+        scale = min(size / height, size / width)
+        new_width, new_height = round(width * scale), round(height * scale)
+        pad_x = (size - new_width) // 2
+        pad_y = (size - new_height) // 2
+
+        padded = np.full((size, size, 3), 114, dtype=np.uint8)
+        padded[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = cv2.resize(
+            image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+        return padded, scale, (pad_x, pad_y)
+
+    def preprocess(self, images, size=None):
+        """
+        Letterbox BGR images into one RGB NCHW float32 blob scaled to 0-1
+
+        Returns:
+            tuple: (blob, list of letterbox results)
+        """
+        letterboxed = [self.letterbox(image, size) for image in images]
+        blob = np.stack([padded[:, :, ::-1] for padded, _, _ in letterboxed])
+        return np.ascontiguousarray(blob.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0, letterboxed
+
+    def _detect(self, images, conf, classes, input_size):
+        # Models exported with dynamic=True take any size, others only their own
+        size = self.input_size if self.fixed_size else (input_size or self.input_size)
+        blob, letterboxed = self.preprocess(images, size)
+
+        # Models exported without dynamic=True only take a fixed batch size
+        step = self.fixed_batch or len(images)
+        outputs = [self.session.run(None, {self.input_name: blob[i:i + step]})[0]
+                   for i in range(0, len(images), step)]
+        outputs = np.concatenate(outputs)
+
+        return [self._decode(output, scale, pad, image.shape[:2], conf, classes)
+                for output, (_, scale, pad), image in zip(outputs, letterboxed, images)]
+
+    def _decode(self, output, scale, pad, image_shape, conf, classes):
+        """Turn one (4 + classes, anchors) output into Detections in image coordinates"""
+        predictions = output.T
+        class_scores = predictions[:, 4:]
+        class_ids = np.argmax(class_scores, axis=1)
+        confidences = class_scores[np.arange(len(class_ids)), class_ids]
+
+        mask = confidences >= conf
+        if classes is not None:
+            mask &= np.isin(class_ids, classes)
+        if not mask.any():
+            return Detections()
+
+        centers = predictions[mask, :4]
+        boxes = np.empty_like(centers)
+        boxes[:, :2] = centers[:, :2] - centers[:, 2:] / 2
+        boxes[:, 2:] = centers[:, :2] + centers[:, 2:] / 2
+
+        # Undo the letterbox
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / scale
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / scale
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, image_shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, image_shape[0])
+
+        confidences, class_ids = confidences[mask], class_ids[mask]
+        keep = non_max_suppression(boxes, confidences, class_ids, config.NMS_IOU_THRESHOLD)
+        return Detections(boxes[keep], confidences[keep], class_ids[keep])
+
+
+class StubBackend(DetectorBackend):
+    """Deterministic backend for tests and benchmarks, no model needed
+
+    With fixed detections it returns them for every image. Otherwise it
+    reports every blob that differs from the image's median (road) color as
+    a car, which finds the car rectangles of synthetic benchmark scenes.
+    With input_size, blobs are searched in a copy shrunk to the input size
+    like a real model input, so cars that become smaller than min_area there
+    are missed.
+    """
+
+    name = 'stub'
+
+    def __init__(self, detections=None, min_area=100, confidence=0.9, input_size=None):
+        super().__init__()
+        self.fixed = detections
+        self.min_area = min_area
+        self.confidence = confidence
+        self.input_size = input_size
+
+    def _load(self):
+        pass
+
+    def _detect(self, images, conf, classes, input_size):
+        detections = []
+        for image in images:
+            if self.fixed is not None:
+                rows = np.asarray(self.fixed, dtype=np.float32).reshape(-1, 6)
+                found = Detections(rows[:, :4], rows[:, 4], rows[:, 5])
+            elif self.input_size:
+                found = self._find_blobs_at(image, input_size or self.input_size)
+            else:
+                found = self._find_blobs(image)
+
+            mask = found.confidences >= conf
+            if classes is not None:
+                mask &= np.isin(found.class_ids, classes)
+            detections.append(Detections(found.boxes[mask], found.confidences[mask], found.class_ids[mask]))
+        return detections
+
+    def _find_blobs_at(self, image, size):
+        scale = min(size / max(image.shape[:2]), 1.0)
+        if scale == 1.0:
+            return self._find_blobs(image)
+        small = cv2.resize(image, (max(1, round(image.shape[1] * scale)), max(1, round(image.shape[0] * scale))),
+                           interpolation=cv2.INTER_AREA)
+        found = self._find_blobs(small)
+        return Detections(found.boxes / scale, found.confidences, found.class_ids)
+
+    def _find_blobs(self, image):
+        background = np.median(image.reshape(-1, 3)[::97], axis=0).astype(np.uint8)
+        difference = cv2.absdiff(image, np.full_like(image, background))
+        foreground = (cv2.max(cv2.max(difference[:, :, 0], difference[:, :, 1]), difference[:, :, 2]) > 30)
+        foreground = foreground.astype(np.uint8)
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(foreground, connectivity=8)
+        stats = stats[1:count]
+        stats = stats[stats[:, cv2.CC_STAT_AREA] >= self.min_area]
+
+        boxes = np.column_stack([
+            stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP],
+            stats[:, cv2.CC_STAT_LEFT] + stats[:, cv2.CC_STAT_WIDTH],
+            stats[:, cv2.CC_STAT_TOP] + stats[:, cv2.CC_STAT_HEIGHT]
+        ]) if len(stats) else np.empty((0, 4))
+        return Detections(boxes, np.full(len(boxes), self.confidence),
+                          np.full(len(boxes), config.CAR_CLASS_ID))
+
+
+BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    StubBackend.name: StubBackend
+}
+
+
+def create_backend(name=None, **kwargs):
+    """Create the backend named in config.DETECTOR_BACKEND (or name)"""
+    name = name or config.DETECTOR_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {name} (options: {', '.join(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
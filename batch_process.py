@@ -0,0 +1,313 @@
+"""
+Headless batch processing for Car Color Detection System
+Processes a directory or glob of images in a pool of worker processes,
+each with its own detector, and streams one result per image to JSONL or CSV
+(JSONL records also list every detected box)
+
+Usage:
+    python batch_process.py snapshots/ -o results.jsonl --workers 4
+    python batch_process.py "snapshots/**/*.jpg" -o results.csv --annotated-dir annotated/
+
+Re-running with the same output file skips images that are already in it,
+so an interrupted run resumes where it stopped.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+import config
+from renderer import render_detections
+
+CSV_FIELDS = [
+    'path', 'width', 'height', 'total_cars', 'blue_cars', 'other_cars', 'total_people',
+    'car_colors', 'avg_car_confidence', 'avg_person_confidence', 'error'
+]
+
+# One detector per worker process, created by _init_worker
+_detector = None
+_annotated_dir = None
+
+
+def image_extensions():
+    """Return the lower-case image extensions listed in config.SUPPORTED_IMAGE_FORMATS"""
+    extensions = set()
+    for _, patterns in config.SUPPORTED_IMAGE_FORMATS:
+        for pattern in patterns.split():
+            extensions.add(pattern.lstrip('*').lower())
+    return extensions
+
+
+def find_images(source, recursive=False):
+    """
+    Find image files in a directory or matching a glob pattern
+
+    Args:
+        source: Directory path or glob pattern
+        recursive: Walk sub-directories when source is a directory
+
+    Returns:
+        tuple: (root directory, sorted list of image paths)
+    """
+    extensions = image_extensions()
+
+    if os.path.isdir(source):
+        root = source
+        if recursive:
+            paths = [os.path.join(folder, name)
+                     for folder, _, names in os.walk(source) for name in names]
+        else:
+            paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source, recursive=True)
+        root = os.path.commonpath([os.path.dirname(os.path.abspath(p)) for p in paths]) if paths else '.'
+
+    paths = [p for p in paths if os.path.splitext(p)[1].lower() in extensions and os.path.isfile(p)]
+    return root, sorted(os.path.abspath(p) for p in paths)
+
+
+def serialize_results(results):
+    """Convert analysis_results into plain JSON-serialisable Python types"""
+    serialized = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            # Color counts, or per-zone counts which are results dicts themselves
+            serialized[key] = {str(k): serialize_results(v) if isinstance(v, dict) else int(v)
+                               for k, v in value.items()}
+        elif isinstance(value, (np.integer, int)):
+            serialized[key] = int(value)
+        elif isinstance(value, (np.floating, float)):
+            serialized[key] = float(value)
+        else:
+            serialized[key] = value
+    return serialized
+
+
+def serialize_detections(detections):
+    """Convert detection dicts into plain JSON-serialisable Python types"""
+    return [{
+        'box': [int(v) for v in detection['box']],
+        'class_id': int(detection['class_id']),
+        'class_name': detection['class_name'],
+        'confidence': round(float(detection['confidence']), 4),
+        'color_bgr': [int(v) for v in detection['color_bgr']] if detection['color_bgr'] is not None else None,
+        'color_name': detection['color_name'],
+        'track_id': detection['track_id'],
+        'zone': detection.get('zone')
+    } for detection in detections]
+
+
+def load_done_paths(output_path):
+    """
+    Return the set of image paths already recorded in an existing output file
+
+    Records with an error are left out so those images are retried.
+    """
+    if not os.path.exists(output_path):
+        return set()
+
+    done = set()
+    with open(output_path, newline='', encoding='utf-8') as f:
+        if output_path.lower().endswith('.csv'):
+            for row in csv.DictReader(f):
+                if row.get('path') and not row.get('error'):
+                    done.add(row['path'])
+        else:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    if not record.get('error'):
+                        done.add(record['path'])
+                except (ValueError, KeyError):
+                    # Partial last line from an interrupted run
+                    continue
+    return done
+
+
+def _init_worker(annotated_dir, threads_per_worker, cache_dir=None):
+    """Load one detector per worker process"""
+    global _detector, _annotated_dir
+
+    cv2.setNumThreads(threads_per_worker)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+    from car_color_detection import CarColorDetector
+    from result_cache import ResultCache
+    _detector = CarColorDetector()
+    _annotated_dir = annotated_dir
+
+    # Workers share the disk tier, so identical snapshots are analysed once
+    if cache_dir:
+        _detector.result_cache = ResultCache(disk_dir=cache_dir)
+
+
+def _process_chunk(chunk):
+    """Process a list of (path, relative path) in one batch and return result records"""
+    records = []
+    images = []
+    loaded = []
+
+    for path, relative_path in chunk:
+        image = cv2.imread(path)
+        if image is None:
+            records.append({'path': path, 'error': 'Could not read image'})
+        else:
+            images.append(image)
+            loaded.append((path, relative_path))
+
+    try:
+        analyzed = _detector.analyze_batch(images) if images else []
+    except Exception as e:
+        return records + [{'path': path, 'error': f"Processing failed: {e}"} for path, _ in loaded]
+
+    for (path, relative_path), image, (detections, results) in zip(loaded, images, analyzed):
+        height, width = image.shape[:2]
+        record = {'path': path, 'width': width, 'height': height}
+        record.update(serialize_results(results))
+        record['detections'] = serialize_detections(detections)
+
+        # Images are only drawn on when annotated copies are wanted
+        if _annotated_dir:
+            annotated_path = os.path.join(_annotated_dir, relative_path)
+            os.makedirs(os.path.dirname(annotated_path), exist_ok=True)
+            cv2.imwrite(annotated_path, render_detections(image, detections, results))
+
+        records.append(record)
+
+    return records
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+class ResultWriter:
+    """Append result records to a JSONL or CSV file, flushing after every write"""
+
+    def __init__(self, output_path):
+        self.is_csv = output_path.lower().endswith('.csv')
+        existing = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+        write_header = self.is_csv and existing == 0
+        self.file = open(output_path, 'a', newline='', encoding='utf-8')
+
+        # Start on a fresh line after a partial last line from an interrupted run
+        if existing and not _ends_with_newline(output_path):
+            self.file.write('\n')
+
+        if self.is_csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            if write_header:
+                self.writer.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self.is_csv:
+                row = dict(record)
+                if 'car_colors' in row:
+                    row['car_colors'] = json.dumps(row['car_colors'])
+                self.writer.writerow(row)
+            else:
+                self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def run(source, output_path, workers=None, annotated_dir=None, recursive=False, batch_size=None,
+        cache_dir=None, log_db=None):
+    """
+    Process every image found in source and stream results to output_path
+
+    Returns:
+        Number of images processed in this run
+    """
+    root, paths = find_images(source, recursive)
+    done = load_done_paths(output_path)
+    pending = [(path, os.path.relpath(path, root)) for path in paths if path not in done]
+
+    print(f"Found {len(paths)} images, {len(paths) - len(pending)} already done, {len(pending)} to process")
+    if not pending:
+        return 0
+
+    workers = workers or max(1, (os.cpu_count() or 2) // 2)
+    batch_size = batch_size or config.BATCH_SIZE
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+
+    writer = ResultWriter(output_path)
+    processed = 0
+
+    # Detections are logged from this process, stamped with each file's modification time
+    detection_log = None
+    if log_db:
+        from detection_log import DetectionLog
+        detection_log = DetectionLog(log_db)
+    start = time.perf_counter()
+
+    try:
+        with Pool(workers, initializer=_init_worker, initargs=(annotated_dir, threads_per_worker, cache_dir)) as pool:
+            for records in pool.imap_unordered(_process_chunk, chunks):
+                writer.write(records)
+                processed += len(records)
+                if detection_log is not None:
+                    for record in records:
+                        if 'detections' in record:
+                            detection_log.record(record['detections'], record['path'],
+                                                 timestamp=os.path.getmtime(record['path']))
+                rate = processed / (time.perf_counter() - start)
+                print(f"\r{processed}/{len(pending)} images ({rate:.1f} images/sec)", end='', flush=True)
+    except KeyboardInterrupt:
+        print("\nInterrupted, re-run the same command to resume")
+    finally:
+        writer.close()
+        if detection_log is not None:
+            detection_log.close()
+
+    print()
+    return processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless batch car color detection")
+    parser.add_argument('source', help="Directory of images or glob pattern")
+    parser.add_argument('-o', '--output', default='results.jsonl',
+                        help="Output file, .jsonl or .csv (default: results.jsonl)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="Worker processes, each loads its own model (default: half the CPUs)")
+    parser.add_argument('-b', '--batch-size', type=int, default=None,
+                        help=f"Images per YOLO call (default: {config.BATCH_SIZE})")
+    parser.add_argument('-a', '--annotated-dir', default=None,
+                        help="Write annotated images into this directory")
+    parser.add_argument('-r', '--recursive', action='store_true',
+                        help="Walk sub-directories when source is a directory")
+    parser.add_argument('-c', '--cache-dir', default=config.RESULT_CACHE_DIR,
+                        help="Keep results on disk here so identical images are only analysed once")
+    parser.add_argument('-l', '--log-db', default=None,
+                        help="Also record every detection in this SQLite detection log")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source) and not glob.has_magic(args.source):
+        print(f"Source not found: {args.source}")
+        sys.exit(1)
+
+    run(args.source, args.output, args.workers, args.annotated_dir, args.recursive, args.batch_size,
+        args.cache_dir, args.log_db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,612 @@
+"""
+Performance benchmarks for Car Color Detection System
+Run with: python benchmark.py <name> (see --help for the list)
+
+The suite benchmark times every stage on synthetic scenes with the stub
+backend by default, so it runs offline and without a model:
+    python benchmark.py suite -o bench.json --check benchmark_thresholds.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import config
+
+SUITE_RESOLUTIONS = ((640, 480), (1280, 720), (1920, 1080))
+SUITE_DENSITIES = (5, 15, 40)
+SUITE_STAGES = ('inference', 'dominant_color', 'classify', 'draw', 'gui_resize')
+
+# Stage timings below this are treated as noise by the baseline comparison
+NOISE_FLOOR_MS = 0.5
+
+
+def time_call(func, *args, repeat=5):
+    """Return the median wall time of func(*args) in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def make_car_crop(width, height, body_color=(200, 60, 20), seed=0):
+    """
+    Create a synthetic car crop: a noisy body color with dark windows and tyres
+
+    Args:
+        width: Crop width in pixels
+        height: Crop height in pixels
+        body_color: BGR body color
+        seed: Random seed for the noise
+
+    Returns:
+        uint8 BGR image
+    """
+    rng = np.random.default_rng(seed)
+    crop = np.empty((height, width, 3), dtype=np.uint8)
+    crop[:] = body_color
+    crop[: height // 3, width // 5: 4 * width // 5] = (40, 40, 40)
+    crop[4 * height // 5:, : width // 4] = (15, 15, 15)
+    crop[4 * height // 5:, 3 * width // 4:] = (15, 15, 15)
+    noise = rng.integers(-20, 21, size=crop.shape)
+    return np.clip(crop.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def make_scene(width, height, n_cars, seed=0):
+    """
+    Create a synthetic traffic scene with colored car rectangles on a gray road
+
+    Cars are placed in their own cells of a grid over the lower three
+    quarters of the scene, so they never overlap.
+
+    Args:
+        width: Scene width in pixels
+        height: Scene height in pixels
+        n_cars: Number of car rectangles
+        seed: Random seed for sizes, placement and colors
+
+    Returns:
+        tuple: (uint8 BGR image, list of (x1, y1, x2, y2, body_color))
+    """
+    rng = np.random.default_rng(seed)
+    scene = np.full((height, width, 3), 90, dtype=np.uint8)
+    cars = []
+    if n_cars == 0:
+        return scene, cars
+
+    road_top = height // 4
+    columns = max(1, int(np.ceil(np.sqrt(n_cars * width / (height - road_top)))))
+    rows = int(np.ceil(n_cars / columns))
+    cell_width = width // columns
+    cell_height = (height - road_top) // rows
+
+    for index, cell in enumerate(rng.permutation(rows * columns)[:n_cars]):
+        row, column = divmod(int(cell), columns)
+        car_width = int(cell_width * rng.uniform(0.5, 0.9))
+        car_height = min(int(car_width * 0.6), int(cell_height * 0.9))
+        x1 = column * cell_width + int(rng.integers(0, cell_width - car_width + 1))
+        y1 = road_top + row * cell_height + int(rng.integers(0, cell_height - car_height + 1))
+
+        # Keep body colors clearly distinct from the road
+        body_color = rng.integers(0, 256, 3)
+        while np.abs(body_color - 90).max() < 60:
+            body_color = rng.integers(0, 256, 3)
+        body_color = tuple(int(c) for c in body_color)
+
+        scene[y1:y1 + car_height, x1:x1 + car_width] = make_car_crop(
+            car_width, car_height, body_color, seed=seed + index)
+        cars.append((x1, y1, x1 + car_width, y1 + car_height, body_color))
+
+    return scene, cars
+
+
+def benchmark_dominant_color(sizes=(32, 64, 128, 256, 512), repeat=5):
+    """Compare latency per crop size of each dominant color method against the original"""
+    from dominant_color import DominantColorEngine
+
+    engines = {'original': DominantColorEngine(method='kmeans', max_pixels=0)}
+    for method in DominantColorEngine.METHODS:
+        engines[method] = DominantColorEngine(method=method)
+
+    print(f"Dominant color latency per crop (ms, median of {repeat}), "
+          f"k={config.KMEANS_CLUSTERS}, max pixels={config.COLOR_SAMPLE_MAX_PIXELS}")
+    print(f"{'crop':>10}" + "".join(f"{name:>12}" for name in engines))
+
+    for size in sizes:
+        crop = make_car_crop(size, size)
+        row = [time_call(engine, crop, repeat=repeat) for engine in engines.values()]
+        print(f"{size:>4}x{size:<5}" + "".join(f"{ms:>12.2f}" for ms in row))
+
+    crop = make_car_crop(128, 128)
+    print("\nDominant color of a 128x128 crop with body (200, 60, 20):")
+    for name, engine in engines.items():
+        print(f"  {name:<12} {tuple(int(c) for c in engine(crop))}")
+
+
+def benchmark_batch(batch_sizes=(1, 2, 4, 8, 16), n_images=32, size=(1280, 720)):
+    """Report images/sec of CarColorDetector.process_batch by batch size"""
+    from car_color_detection import CarColorDetector
+
+    detector = CarColorDetector()
+    images = [make_scene(size[0], size[1], 10, seed=index)[0] for index in range(n_images)]
+
+    # Warm up so the first timed batch does not pay for model initialisation
+    detector.process_batch([image.copy() for image in images[:2]])
+
+    print(f"Batched processing of {n_images} images at {size[0]}x{size[1]}")
+    print(f"{'batch size':>12}{'images/sec':>14}{'ms/image':>12}")
+
+    for batch_size in batch_sizes:
+        frames = [image.copy() for image in images]
+        start = time.perf_counter()
+        detector.process_batch(frames, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{batch_size:>12}{n_images / elapsed:>14.2f}{elapsed / n_images * 1000:>12.2f}")
+
+
+def benchmark_microbatch(callers=(1, 2, 4, 8, 16), frames_per_caller=16, size=(1280, 720)):
+    """Compare concurrent per-frame calls on one detector with the same frames through MicroBatcher"""
+    from concurrent.futures import ThreadPoolExecutor
+    from car_color_detection import CarColorDetector
+    from micro_batcher import MicroBatcher
+
+    detector = CarColorDetector()
+    images = [make_scene(size[0], size[1], 10, seed=index)[0] for index in range(frames_per_caller)]
+    detector.analyze_batch(images[:2])
+
+    # Direct callers share the detector; the backend serialises their forward passes
+    def direct(_):
+        for image in images:
+            detector.analyze_image(image)
+
+    def batched(batcher):
+        futures = [batcher.submit(image) for image in images]
+        for future in futures:
+            future.result()
+
+    print(f"Concurrent callers sending {frames_per_caller} frames each at {size[0]}x{size[1]}, "
+          f"max batch {config.MICRO_BATCH_SIZE}, max wait {config.MICRO_BATCH_WAIT_MS} ms")
+    print(f"{'callers':>8}{'direct fps':>12}{'batched fps':>13}{'mean batch':>12}{'fill':>7}{'wait p95 ms':>13}")
+
+    for n_callers in callers:
+        with ThreadPoolExecutor(n_callers) as pool:
+            start = time.perf_counter()
+            list(pool.map(direct, range(n_callers)))
+            direct_fps = n_callers * frames_per_caller / (time.perf_counter() - start)
+
+            with MicroBatcher(detector) as batcher:
+                start = time.perf_counter()
+                list(pool.map(batched, [batcher] * n_callers))
+                batched_fps = n_callers * frames_per_caller / (time.perf_counter() - start)
+                stats = batcher.stats()
+
+        print(f"{n_callers:>8}{direct_fps:>12.1f}{batched_fps:>13.1f}{stats['mean_batch_size']:>12.1f}"
+              f"{stats['fill_ratio']:>7.0%}{stats['wait_p95_ms']:>13.1f}")
+
+
+def make_traffic_sequence(n_frames=300, size=(1280, 720), moving_every=60, moving_frames=20, seed=0):
+    """
+    Frames of a mostly static scene with sensor noise and a car crossing now and then
+
+    Returns:
+        List of BGR frames
+    """
+    scene, _ = make_scene(size[0], size[1], 8, seed=seed)
+    rng = np.random.default_rng(seed)
+    car = make_car_crop(160, 80, (235, 235, 235), seed=seed)
+    frames = []
+
+    for index in range(n_frames):
+        frame = scene.copy()
+        phase = index % moving_every
+        if phase < moving_frames:
+            x = int(phase / moving_frames * (size[0] - car.shape[1]))
+            y = size[1] // 3
+            frame[y:y + car.shape[0], x:x + car.shape[1]] = car
+        noise = rng.normal(0, 3, frame.shape)
+        frames.append(np.clip(frame + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def benchmark_cameras(cameras=(1, 2, 4, 8), workers=(1, 2, 4), n_frames=60, size=(1280, 720)):
+    """Throughput of the multi-camera worker pool by number of cameras and workers, on local video files"""
+    import tempfile
+    from camera_pool import CameraPool
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for index in range(max(cameras)):
+            path = os.path.join(directory, f'camera{index}.avi')
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, size)
+            for frame in make_traffic_sequence(n_frames, size, seed=index):
+                writer.write(frame)
+            writer.release()
+            paths.append(path)
+
+        print(f"Camera pool on {n_frames}-frame {size[0]}x{size[1]} video files, "
+              f"backend={config.DETECTOR_BACKEND}, worker batch {config.POOL_WORKER_BATCH}")
+        print(f"{'cameras':>8}{'workers':>8}{'total fps':>11}{'camera fps min-max':>20}{'latency ms':>12}")
+
+        for n_workers in workers:
+            for n_cameras in cameras:
+                with CameraPool(paths[:n_cameras], n_workers) as pool:
+                    for _ in pool.results():
+                        pass
+                    stats = pool.stats()
+                fps = [camera['fps'] for camera in stats['cameras']]
+                latency = np.mean([camera['latency_ms'] for camera in stats['cameras']])
+                print(f"{n_cameras:>8}{n_workers:>8}{stats['fps']:>11.1f}"
+                      f"{f'{min(fps):.1f}-{max(fps):.1f}':>20}{latency:>12.1f}")
+
+
+def benchmark_motion(n_frames=300):
+    """Compare analysing every frame with motion-gated analysis on a mostly static sequence"""
+    from car_color_detection import CarColorDetector
+    from motion_gate import MotionGate
+
+    frames = make_traffic_sequence(n_frames)
+    detector = CarColorDetector()
+    detector.analyze_image(frames[0])
+
+    start = time.perf_counter()
+    every_frame = [detector.analyze_image(frame)[1] for frame in frames]
+    ungated_ms = (time.perf_counter() - start) / n_frames * 1000
+
+    # Frames are 1/30 s apart, so the forced re-detection interval is in video time
+    gate = MotionGate()
+    gated = []
+    start = time.perf_counter()
+    for index, frame in enumerate(frames):
+        if gate.should_detect(frame, now=index / 30) or not gated:
+            gated.append(detector.analyze_image(frame)[1])
+        else:
+            gated.append(gated[-1])
+    gated_ms = (time.perf_counter() - start) / n_frames * 1000
+
+    stats = gate.stats()
+    agreement = np.mean([a['total_cars'] == b['total_cars'] for a, b in zip(every_frame, gated)])
+    print(f"{n_frames} frames of a static scene with a car crossing every 2 s, "
+          f"threshold {gate.threshold}, max interval {gate.max_interval} s")
+    print(f"{'':>10}{'ms/frame':>10}{'analysed':>10}{'reused':>8}{'forced':>8}{'same car count':>16}")
+    print(f"{'every':>10}{ungated_ms:>10.1f}{n_frames:>10}{0:>8}{0:>8}{1:>16.0%}")
+    print(f"{'gated':>10}{gated_ms:>10.1f}{stats['detected']:>10}{stats['reused']:>8}{stats['forced']:>8}"
+          f"{agreement:>16.0%}")
+
+
+def match_cars(detections, cars, iou_threshold=0.5):
+    """
+    Match detected cars to ground truth cars by IoU
+
+    Returns:
+        List of (ground truth index, detection) for every matched car
+    """
+    from tracker import box_iou
+
+    detected = [d for d in detections if d['class_name'] == 'car']
+    if not detected or not cars:
+        return []
+
+    iou = box_iou([car[:4] for car in cars], [d['box'] for d in detected])
+    matches = []
+    used = set()
+    for index in range(len(cars)):
+        best = int(np.argmax(iou[index]))
+        if iou[index, best] >= iou_threshold and best not in used:
+            used.add(best)
+            matches.append((index, detected[best]))
+    return matches
+
+
+def benchmark_resize(max_sides=(None, 2560, 1920, 1280, 960, 640), size=(3840, 2160), n_cars=40, repeat=3):
+    """Report the speed/accuracy tradeoff of each ANALYSIS_MAX_SIDE setting on a large scene"""
+    from car_color_detection import CarColorDetector
+    from resize_policy import ResizePolicy
+
+    scene, cars = make_scene(size[0], size[1], n_cars, seed=7)
+    detector = CarColorDetector()
+    expected = detector.classify_colors([body_color for *_, body_color in cars])
+
+    print(f"Resize policy on a {size[0]}x{size[1]} scene with {n_cars} cars, "
+          f"backend={detector.backend.name}, inference size={config.INFERENCE_SIZE}")
+    print(f"{'max side':>10}{'working MB':>12}{'ms/image':>12}{'car recall':>12}{'colors ok':>11}")
+
+    for max_side in max_sides:
+        detector.resize_policy = ResizePolicy(max_side or 0)
+        detector.analyze_image(scene)
+        ms = time_call(detector.analyze_image, scene, repeat=repeat)
+
+        detections, _ = detector.analyze_image(scene)
+        matches = match_cars(detections, cars)
+        recall = len(matches) / n_cars
+        colors_ok = np.mean([d['color_name'] == expected[i] for i, d in matches]) if matches else 0.0
+        working_mb = detector.resize_policy.prepare(scene)[0].nbytes / 1e6
+
+        print(f"{str(max_side or 'off'):>10}{working_mb:>12.1f}{ms:>12.1f}{recall:>12.0%}{colors_ok:>11.0%}")
+
+
+def benchmark_tiling(settings=((640, 128, True, None), (640, 128, True, 0), (640, 128, False, None),
+                                (640, 64, True, None), (960, 128, True, None), (1280, 192, True, None)),
+                     size=(3840, 2160), n_cars=300, repeat=3):
+    """
+    Compare car recall and latency of tiled inference with one full-frame pass on a 4K scene
+
+    Settings are (tile size, overlap, full-frame pass, ANALYSIS_MAX_SIDE or
+    None for the configured one). With the stub backend, blobs are searched
+    at INFERENCE_SIZE like a real model input, so small cars go missing in
+    the single pass.
+    """
+    from backends import StubBackend
+    from car_color_detection import CarColorDetector
+    from resize_policy import ResizePolicy
+    from tiling import TiledInference
+
+    scene, cars = make_scene(size[0], size[1], n_cars, seed=11)
+    backend = StubBackend(input_size=config.INFERENCE_SIZE) if config.DETECTOR_BACKEND == 'stub' else None
+    detector = CarColorDetector(backend)
+    expected = detector.classify_colors([body_color for *_, body_color in cars])
+
+    print(f"Tiled inference on a {size[0]}x{size[1]} scene with {n_cars} cars, "
+          f"backend={detector.backend.name}, inference size={config.INFERENCE_SIZE}")
+    print(f"{'mode':<42}{'tiles':>7}{'ms/image':>12}{'car recall':>12}{'colors ok':>11}")
+
+    runs = [('single pass', None, None)] + [
+        (f"{tile}px, {overlap}px overlap{', +full' if full_frame else ''}"
+         f"{'' if max_side is None else ', max side ' + str(max_side or 'off')}",
+         TiledInference(tile, overlap, min_side=0, full_frame=full_frame), max_side)
+        for tile, overlap, full_frame, max_side in settings
+    ]
+    for name, tiling, max_side in runs:
+        detector.tiling = tiling
+        detector.resize_policy = ResizePolicy(max_side)
+        detector.analyze_image(scene)
+        ms = time_call(detector.analyze_image, scene, repeat=repeat)
+
+        detections, _ = detector.analyze_image(scene)
+        matches = match_cars(detections, cars)
+        recall = len(matches) / n_cars
+        colors_ok = np.mean([d['color_name'] == expected[i] for i, d in matches]) if matches else 0.0
+        working = detector.resize_policy.prepare(scene)[0]
+        tiles = len(tiling.tiles(working.shape)) + tiling.full_frame if tiling is not None else 1
+
+        print(f"{name:<42}{tiles:>7}{ms:>12.1f}{recall:>12.0%}{colors_ok:>11.0%}")
+
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from car_color_detection import CarColorDetector
+imported = time.perf_counter()
+detector = CarColorDetector(sys.argv[1])
+constructed = time.perf_counter()
+detector.warm_up()
+warmed = time.perf_counter()
+from benchmark import make_scene
+detector.process_image(make_scene(1280, 720, 10)[0])
+first_result = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'construct': constructed - imported,
+    'warm_up': warmed - constructed,
+    'first_result': first_result - warmed,
+    'total': first_result - start
+}))
+"""
+
+
+def benchmark_startup(runs=3, backend=None):
+    """Measure cold import time and time to first result in fresh interpreters"""
+    # The child does not see config changes made here, so the backend is passed on
+    backend = backend or config.DETECTOR_BACKEND
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, backend], capture_output=True,
+                                text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        timings.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"Startup time in a fresh interpreter (s, median of {runs}), backend={backend}")
+    for stage in ('import', 'construct', 'warm_up', 'first_result', 'total'):
+        print(f"  {stage:<14}{np.median([t[stage] for t in timings]):>8.3f}")
+
+
+def run_suite(backend='stub', repeat=5):
+    """
+    Time each stage separately on synthetic scenes of several resolutions and densities
+
+    Returns:
+        Dictionary with the run settings and per-scene stage timings in ms
+    """
+    from car_color_detection import CarColorDetector
+    from gui import resize_image_for_display
+    from renderer import render_detections
+
+    detector = CarColorDetector(backend)
+    detector.warm_up()
+    scenes = {}
+
+    for width, height in SUITE_RESOLUTIONS:
+        for n_cars in SUITE_DENSITIES:
+            scene, cars = make_scene(width, height, n_cars, seed=n_cars)
+            crops = [scene[y1:y2, x1:x2] for x1, y1, x2, y2, _ in cars]
+            dominant_colors = [detector.detect_dominant_color(crop) for crop in crops]
+            detections, analysis_results = detector.analyze_image(scene)
+            canvas = scene.copy()
+
+            stages = {
+                'inference': time_call(detector.detect_objects, [scene], repeat=repeat),
+                'dominant_color': time_call(lambda: [detector.detect_dominant_color(crop) for crop in crops],
+                                            repeat=repeat),
+                'classify': time_call(detector.classify_colors, dominant_colors, repeat=repeat),
+                'draw': time_call(render_detections, canvas, detections, analysis_results, repeat=repeat),
+                'gui_resize': time_call(
+                    lambda: cv2.cvtColor(resize_image_for_display(scene, config.DISPLAY_WIDTH, config.DISPLAY_HEIGHT),
+                                         cv2.COLOR_BGR2RGB), repeat=repeat)
+            }
+
+            # Ground truth color is the classification of each car's body color
+            expected = detector.classify_colors([body_color for *_, body_color in cars])
+            found = detector.classify_colors(dominant_colors)
+
+            scenes[f"{width}x{height}_{n_cars}cars"] = {
+                'stages_ms': stages,
+                'cars': n_cars,
+                'detected_cars': analysis_results['total_cars'],
+                'color_accuracy': float(np.mean(expected == found))
+            }
+
+    return {
+        'backend': detector.backend.name,
+        'dominant_color_method': detector.color_engine.method,
+        'repeat': repeat,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scenes': scenes
+    }
+
+
+def check_thresholds(report, thresholds):
+    """
+    Compare a suite report against absolute limits
+
+    Args:
+        report: Output of run_suite
+        thresholds: Dictionary with 'stages_ms' limits per scene and stage,
+            and optionally 'min_color_accuracy'
+
+    Returns:
+        List of failure messages
+    """
+    failures = []
+    for scene, limits in thresholds.get('stages_ms', {}).items():
+        measured = report['scenes'].get(scene)
+        if measured is None:
+            continue
+        for stage, limit in limits.items():
+            if measured['stages_ms'][stage] > limit:
+                failures.append(f"{scene} {stage}: {measured['stages_ms'][stage]:.2f} ms > {limit:.2f} ms")
+
+    min_accuracy = thresholds.get('min_color_accuracy')
+    if min_accuracy is not None:
+        for scene, measured in report['scenes'].items():
+            if measured['color_accuracy'] < min_accuracy:
+                failures.append(f"{scene} color accuracy: {measured['color_accuracy']:.2f} < {min_accuracy:.2f}")
+
+    return failures
+
+
+def check_baseline(report, baseline, tolerance):
+    """Return failure messages for stages slower than tolerance x a previous report"""
+    failures = []
+    for scene, measured in report['scenes'].items():
+        previous = baseline['scenes'].get(scene)
+        if previous is None:
+            continue
+        for stage, ms in measured['stages_ms'].items():
+            limit = max(previous['stages_ms'][stage] * tolerance, NOISE_FLOOR_MS)
+            if ms > limit:
+                failures.append(f"{scene} {stage}: {ms:.2f} ms > {tolerance:.2f} x baseline "
+                                f"{previous['stages_ms'][stage]:.2f} ms")
+    return failures
+
+
+def make_thresholds(report, headroom):
+    """Build a thresholds dict allowing headroom x the timings of a report"""
+    return {
+        'backend': report['backend'],
+        'min_color_accuracy': round(min(s['color_accuracy'] for s in report['scenes'].values()) - 0.1, 2),
+        'stages_ms': {scene: {stage: round(max(ms * headroom, NOISE_FLOOR_MS), 2)
+                              for stage, ms in measured['stages_ms'].items()}
+                      for scene, measured in report['scenes'].items()}
+    }
+
+
+def benchmark_suite(backend='stub', output=None, check=None, baseline=None, tolerance=2.0,
+                    write_thresholds=None, headroom=5.0):
+    """Run the stage suite, print it, write JSON and check for regressions"""
+    report = run_suite(backend)
+
+    print(f"Stage timings (ms, median), backend={report['backend']}, "
+          f"color method={report['dominant_color_method']}")
+    print(f"{'scene':<20}" + "".join(f"{stage:>15}" for stage in SUITE_STAGES) + f"{'colors ok':>11}")
+    for scene, measured in report['scenes'].items():
+        print(f"{scene:<20}" + "".join(f"{measured['stages_ms'][stage]:>15.2f}" for stage in SUITE_STAGES)
+              + f"{measured['color_accuracy']:>11.0%}")
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {output}")
+
+    if write_thresholds:
+        with open(write_thresholds, 'w', encoding='utf-8') as f:
+            json.dump(make_thresholds(report, headroom), f, indent=2)
+        print(f"Thresholds written to {write_thresholds}")
+
+    failures = []
+    if check:
+        with open(check, encoding='utf-8') as f:
+            failures += check_thresholds(report, json.load(f))
+    if baseline:
+        with open(baseline, encoding='utf-8') as f:
+            failures += check_baseline(report, json.load(f), tolerance)
+
+    if failures:
+        print("\nREGRESSIONS:")
+        for failure in failures:
+            print(f"  ✗ {failure}")
+        sys.exit(1)
+    elif check or baseline:
+        print("\n✓ No regressions")
+
+
+BENCHMARKS = {
+    'color': benchmark_dominant_color,
+    'batch': benchmark_batch,
+    'cameras': benchmark_cameras,
+    'microbatch': benchmark_microbatch,
+    'motion': benchmark_motion,
+    'startup': benchmark_startup,
+    'resize': benchmark_resize,
+    'tiling': benchmark_tiling,
+    'suite': benchmark_suite
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('name', choices=sorted(BENCHMARKS), help="Benchmark to run")
+    parser.add_argument('--backend', default=None,
+                        help="Detector backend (default: config.DETECTOR_BACKEND, stub for suite)")
+    parser.add_argument('-o', '--output', default=None, help="suite: write the JSON report here")
+    parser.add_argument('--check', default=None, help="suite: thresholds JSON to check against")
+    parser.add_argument('--baseline', default=None, help="suite: previous JSON report to compare with")
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help="suite: allowed slowdown factor against --baseline (default: 2.0)")
+    parser.add_argument('--write-thresholds', default=None,
+                        help="suite: write thresholds with --headroom x the measured timings")
+    parser.add_argument('--headroom', type=float, default=5.0, help="suite: factor for --write-thresholds")
+    args = parser.parse_args()
+
+    if args.backend:
+        config.DETECTOR_BACKEND = args.backend
+
+    # Repeated frames must be analysed every time, not answered from the result cache
+    config.RESULT_CACHE_ENABLED = False
+
+    print("=" * 60)
+    if args.name == 'suite':
+        benchmark_suite(args.backend or 'stub', args.output, args.check, args.baseline,
+                        args.tolerance, args.write_thresholds, args.headroom)
+    else:
+        BENCHMARKS[args.name]()
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,516 @@
+"""
+Multi-Camera Worker Pool for Car Color Detection System
+One capture process per camera writes frames into a shared-memory ring
+buffer, and a pool of detector worker processes, each loading the model
+once, analyses them. Only slot numbers travel over the task queue and only
+detections come back over the result queue, so frames are never pickled.
+A scheduler thread in the supervisor hands out frames round-robin over the
+cameras, with a cap on the frames of one camera in flight, so a fast
+camera cannot starve the others
+
+Usage:
+    python camera_pool.py 0 1 junction_north.mp4 --workers 4 -r results.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+import config
+
+# Slot states of a ring buffer
+FREE, WRITING, READY, BUSY = range(4)
+
+
+def is_live(source):
+    """True for a webcam index, False for a video file"""
+    return isinstance(source, int) or str(source).isdigit()
+
+
+def probe_source(source):
+    """
+    Open a camera or video file once to find its frame size
+
+    Returns:
+        tuple: (height, width, 3)
+    """
+    capture = cv2.VideoCapture(int(source) if is_live(source) else source)
+    try:
+        if not capture.isOpened():
+            raise IOError(f"Could not open camera source {source}")
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        if not width or not height:
+            ret, frame = capture.read()
+            if not ret:
+                raise IOError(f"Could not read a frame from camera source {source}")
+            height, width = frame.shape[:2]
+        return (height, width, 3)
+    finally:
+        capture.release()
+
+
+class FrameRing:
+    """Fixed number of frame slots in one shared memory block, with their state and sequence numbers
+
+    The supervisor creates the ring; capture and worker processes attach to
+    it by name. Slot bookkeeping lives in small multiprocessing arrays that
+    share the states array's lock.
+    """
+
+    def __init__(self, shape, slots, name=None, states=None, sequences=None, times=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        size = int(np.prod(self.shape)) * slots
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(create=True, size=size) if self.owner \
+            else shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+        self.states = states if states is not None else multiprocessing.Array('b', slots)
+        self.sequences = sequences if sequences is not None else multiprocessing.Array('q', slots, lock=False)
+        self.times = times if times is not None else multiprocessing.Array('d', slots, lock=False)
+
+    def spec(self):
+        """Everything another process needs to attach to this ring"""
+        return (self.shape, self.slots, self.shm.name, self.states, self.sequences, self.times)
+
+    @classmethod
+    def attach(cls, spec):
+        shape, slots, name, states, sequences, times = spec
+        return cls(shape, slots, name, states, sequences, times)
+
+    def reserve(self, drop_oldest):
+        """
+        Claim a slot for writing the next frame
+
+        Args:
+            drop_oldest: When every slot is taken, overwrite the oldest frame
+                         that has not been handed out yet
+
+        Returns:
+            tuple: (slot or None if the ring is full, True if a frame was dropped)
+        """
+        with self.states.get_lock():
+            states = self.states.get_obj()
+            for slot in range(self.slots):
+                if states[slot] == FREE:
+                    states[slot] = WRITING
+                    return slot, False
+            if drop_oldest:
+                ready = [slot for slot in range(self.slots) if states[slot] == READY]
+                if ready:
+                    slot = min(ready, key=lambda s: self.sequences[s])
+                    states[slot] = WRITING
+                    return slot, True
+        return None, False
+
+    def publish(self, slot, sequence, captured_at):
+        """Mark a written slot as ready to be analysed"""
+        with self.states.get_lock():
+            self.sequences[slot] = sequence
+            self.times[slot] = captured_at
+            self.states.get_obj()[slot] = READY
+
+    def take(self, newest):
+        """
+        Hand out one ready frame, marking its slot busy
+
+        Args:
+            newest: Take the newest ready frame and free the older ones
+                    (live cameras), instead of the oldest (video files)
+
+        Returns:
+            tuple: (slot, sequence, capture time, frames dropped), or None
+        """
+        with self.states.get_lock():
+            states = self.states.get_obj()
+            ready = [slot for slot in range(self.slots) if states[slot] == READY]
+            if not ready:
+                return None
+            ready.sort(key=lambda s: self.sequences[s])
+            slot = ready[-1] if newest else ready[0]
+            dropped = 0
+            if newest:
+                for old in ready[:-1]:
+                    states[old] = FREE
+                    dropped += 1
+            states[slot] = BUSY
+            return slot, self.sequences[slot], self.times[slot], dropped
+
+    def release(self, slot):
+        """Free a slot after its frame has been analysed"""
+        with self.states.get_lock():
+            self.states.get_obj()[slot] = FREE
+
+    def pending(self):
+        """Number of slots being written or waiting to be analysed"""
+        with self.states.get_lock():
+            return sum(state in (WRITING, READY) for state in self.states.get_obj())
+
+    def close(self):
+        # Views into the buffer have to go before the mapping can be closed
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _capture_process(camera, source, ring_spec, counters, done, stop):
+    """Read one camera or video file into its ring until it ends or the pool stops"""
+    ring = FrameRing.attach(ring_spec)
+    live = is_live(source)
+    capture = cv2.VideoCapture(int(source) if live else source)
+    if live:
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    sequence = 0
+
+    try:
+        while not stop.is_set():
+            ret, frame = capture.read()
+            if not ret:
+                if live:
+                    time.sleep(0.01)
+                    continue
+                break
+
+            # Live cameras replace frames nobody took, video files wait for a free slot
+            slot, dropped = ring.reserve(drop_oldest=live)
+            while slot is None and not stop.is_set():
+                time.sleep(0.001)
+                slot, dropped = ring.reserve(drop_oldest=live)
+            if slot is None:
+                break
+
+            if frame.shape != ring.shape:
+                frame = cv2.resize(frame, (ring.shape[1], ring.shape[0]))
+            ring.frames[slot] = frame
+            ring.publish(slot, sequence, time.time())
+            sequence += 1
+            with counters.get_lock():
+                counters[0] += 1
+                counters[1] += dropped
+    finally:
+        capture.release()
+        ring.close()
+        done.set()
+
+
+def _worker_process(worker, backend, ring_specs, tasks, results, batch_size, threads):
+    """Load one detector and analyse frames from any camera until told to stop"""
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    from car_color_detection import CarColorDetector
+    detector = CarColorDetector(backend)
+    detector.warm_up()
+    rings = [FrameRing.attach(spec) for spec in ring_specs]
+    results.put(('ready', worker))
+
+    frames = None
+    stopping = False
+    while not stopping:
+        batch = [tasks.get()]
+        while len(batch) < batch_size:
+            try:
+                batch.append(tasks.get_nowait())
+            except queue.Empty:
+                break
+        if None in batch:
+            stopping = True
+            batch = [task for task in batch if task is not None]
+        if not batch:
+            continue
+
+        # Slots stay busy until the supervisor has the results, so the views are safe to read
+        frames = [rings[camera].frames[slot] for camera, slot, _, _ in batch]
+        try:
+            analyzed = detector.analyze_batch(frames)
+            error = None
+        except Exception as e:
+            analyzed = [([], None)] * len(batch)
+            error = f"Processing failed: {e}"
+        for (camera, slot, sequence, captured_at), (detections, analysis_results) in zip(batch, analyzed):
+            results.put(('result', worker, camera, slot, sequence, captured_at, detections,
+                         analysis_results, error))
+
+    del frames
+    for ring in rings:
+        ring.close()
+
+
+class CameraPool:
+    """Supervisor for capture processes, detector workers and the per-camera scheduler"""
+
+    def __init__(self, sources=None, workers=None, slots=None, camera_inflight=None, worker_batch=None,
+                 backend=None):
+        self.sources = list(sources if sources is not None else config.CAMERA_SOURCES)
+        self.workers = workers or config.POOL_WORKERS
+        self.slots = slots or config.POOL_RING_SLOTS
+        self.camera_inflight = camera_inflight or config.POOL_CAMERA_INFLIGHT
+        self.worker_batch = worker_batch or config.POOL_WORKER_BATCH
+        self.backend = backend or config.DETECTOR_BACKEND
+
+        # At most two frames per worker are queued, so the scheduler's order is what runs
+        self.max_inflight = 2 * self.workers
+
+        self._rings = []
+        self._processes = []
+        self._captures = []
+        self._running = False
+        self._scheduler = None
+        self._output = queue.Queue()
+        self._finished = threading.Event()
+
+    def start(self):
+        """Start the workers, wait until their models are loaded, then start the cameras"""
+        if self._running:
+            return self
+        n_cameras = len(self.sources)
+        self._rings = [FrameRing(probe_source(source), self.slots) for source in self.sources]
+        self._tasks = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._stop = multiprocessing.Event()
+        self._counters = [multiprocessing.Array('q', 2) for _ in range(n_cameras)]
+        self._done = [multiprocessing.Event() for _ in range(n_cameras)]
+
+        self._inflight = [0] * n_cameras
+        self._analysed = [0] * n_cameras
+        self._skipped = [0] * n_cameras
+        self._latency = [0.0] * n_cameras
+        self._per_worker = [0] * self.workers
+        self._errors = 0
+        self._next_camera = 0
+        self._finished.clear()
+
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        specs = [ring.spec() for ring in self._rings]
+        for worker in range(self.workers):
+            process = multiprocessing.Process(
+                target=_worker_process, name=f'detector-{worker}', daemon=True,
+                args=(worker, self.backend, specs, self._tasks, self._results, self.worker_batch, threads))
+            process.start()
+            self._processes.append(process)
+
+        ready = 0
+        while ready < self.workers:
+            try:
+                message = self._results.get(timeout=1.0)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._processes):
+                    self.stop()
+                    raise RuntimeError("A detector worker exited while loading the model")
+                continue
+            ready += message[0] == 'ready'
+
+        for camera, source in enumerate(self.sources):
+            process = multiprocessing.Process(
+                target=_capture_process, name=f'camera-{camera}', daemon=True,
+                args=(camera, source, specs[camera], self._counters[camera], self._done[camera], self._stop))
+            process.start()
+            self._captures.append(process)
+
+        self.started_at = time.perf_counter()
+        self._running = True
+        self._scheduler = threading.Thread(target=self._schedule, name='camera-scheduler', daemon=True)
+        self._scheduler.start()
+        return self
+
+    def stop(self):
+        """Stop the cameras and workers and free the shared memory"""
+        self._running = False
+        if self._scheduler is not None:
+            self._scheduler.join()
+            self._scheduler = None
+        if self._processes or self._captures:
+            self._stop.set()
+            for _ in self._processes:
+                self._tasks.put(None)
+            for process in self._captures + self._processes:
+                process.join(timeout=5.0)
+                if process.is_alive():
+                    process.terminate()
+        self._processes, self._captures = [], []
+        for ring in self._rings:
+            ring.close()
+        self._rings = []
+        self._finished.set()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def results(self, timeout=None):
+        """
+        Yield one result dict per analysed frame, as they arrive
+
+        Results carry camera, source, sequence (frame number of that camera),
+        latency (seconds from capture to result), worker, detections,
+        analysis_results and error. The generator ends when every video
+        file has been analysed, when the pool stops, or after timeout seconds.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while deadline is None or time.perf_counter() < deadline:
+            try:
+                yield self._output.get(timeout=0.1)
+            except queue.Empty:
+                if self._finished.is_set() and self._output.empty():
+                    return
+
+    def _schedule(self):
+        while self._running:
+            got_result = self._collect(timeout=0.002)
+            self._dispatch()
+            if not got_result and self._all_done():
+                self._finished.set()
+                return
+
+    def _collect(self, timeout):
+        """Move finished frames from the result queue to the output queue, freeing their slots"""
+        collected = False
+        while True:
+            try:
+                message = self._results.get(timeout=timeout if not collected else 0)
+            except queue.Empty:
+                return collected
+            _, worker, camera, slot, sequence, captured_at, detections, analysis_results, error = message
+            self._rings[camera].release(slot)
+            self._inflight[camera] -= 1
+            self._analysed[camera] += 1
+            self._per_worker[worker] += 1
+            latency = time.time() - captured_at
+            self._latency[camera] += latency
+            self._errors += error is not None
+            self._output.put({
+                'camera': camera,
+                'source': self.sources[camera],
+                'sequence': sequence,
+                'latency': latency,
+                'worker': worker,
+                'detections': detections,
+                'analysis_results': analysis_results,
+                'error': error
+            })
+            collected = True
+
+    def _dispatch(self):
+        """Hand out ready frames round-robin over the cameras, one per camera per round"""
+        n_cameras = len(self.sources)
+        while sum(self._inflight) < self.max_inflight:
+            # The round starts where the last one stopped; _next_camera only
+            # moves once the round is over
+            start = self._next_camera
+            last_served = None
+            for offset in range(n_cameras):
+                if sum(self._inflight) >= self.max_inflight:
+                    break
+                camera = (start + offset) % n_cameras
+                if self._inflight[camera] >= self.camera_inflight:
+                    continue
+                taken = self._rings[camera].take(newest=is_live(self.sources[camera]))
+                if taken is None:
+                    continue
+                slot, sequence, captured_at, skipped = taken
+                self._skipped[camera] += skipped
+                self._inflight[camera] += 1
+                self._tasks.put((camera, slot, sequence, captured_at))
+                last_served = camera
+            if last_served is None:
+                return
+            self._next_camera = (last_served + 1) % n_cameras
+
+    def _all_done(self):
+        return (all(done.is_set() for done in self._done) and not any(self._inflight)
+                and not any(ring.pending() for ring in self._rings))
+
+    def stats(self):
+        """
+        Return throughput per camera and per worker
+
+        Returns:
+            Dictionary with elapsed seconds, total fps, errors, frames per
+            worker and a list of per-camera dicts (source, captured, dropped,
+            analysed, fps, mean latency in ms)
+        """
+        elapsed = time.perf_counter() - self.started_at
+        cameras = []
+        for camera, source in enumerate(self.sources):
+            captured, dropped = self._counters[camera][:]
+            analysed = self._analysed[camera]
+            cameras.append({
+                'source': source,
+                'captured': captured,
+                'dropped': dropped + self._skipped[camera],
+                'analysed': analysed,
+                'fps': analysed / elapsed if elapsed else 0.0,
+                'latency_ms': self._latency[camera] / analysed * 1000 if analysed else 0.0
+            })
+        return {
+            'elapsed': elapsed,
+            'fps': sum(self._analysed) / elapsed if elapsed else 0.0,
+            'errors': self._errors,
+            'per_worker': list(self._per_worker),
+            'cameras': cameras
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse several cameras or video files with a pool of detector processes")
+    parser.add_argument('sources', nargs='*', default=None,
+                        help="Webcam indexes or video files (default: config.CAMERA_SOURCES)")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help=f"Detector processes (default: {config.POOL_WORKERS})")
+    parser.add_argument('-r', '--results', default=None, help="Per-frame results JSONL file")
+    parser.add_argument('-d', '--duration', type=float, default=None,
+                        help="Stop after this many seconds (default: when every video ends)")
+    args = parser.parse_args()
+
+    from batch_process import serialize_detections, serialize_results
+
+    sources = [int(source) if source.isdigit() else source for source in args.sources] or None
+    output = open(args.results, 'w', encoding='utf-8') if args.results else None
+    pool = CameraPool(sources, args.workers)
+    print(f"Starting {pool.workers} detector workers for {len(pool.sources)} cameras...")
+
+    try:
+        with pool:
+            for result in pool.results(timeout=args.duration):
+                if output is not None:
+                    record = {'camera': result['camera'], 'source': str(result['source']),
+                              'frame': result['sequence'], 'latency': round(result['latency'], 4)}
+                    if result['error']:
+                        record['error'] = result['error']
+                    else:
+                        record.update(serialize_results(result['analysis_results']))
+                        record['detections'] = serialize_detections(result['detections'])
+                    output.write(json.dumps(record) + '\n')
+            stats = pool.stats()
+    except KeyboardInterrupt:
+        stats = pool.stats()
+    finally:
+        if output is not None:
+            output.close()
+
+    print(f"Analysed {sum(c['analysed'] for c in stats['cameras'])} frames in {stats['elapsed']:.1f} s "
+          f"({stats['fps']:.1f} frames/sec), frames per worker: {stats['per_worker']}")
+    for camera in stats['cameras']:
+        print(f"  {str(camera['source']):<30}{camera['analysed']:>7} analysed{camera['dropped']:>7} dropped"
+              f"{camera['fps']:>8.1f} fps{camera['latency_ms']:>9.1f} ms latency")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,148 +1,416 @@
-import cv2
 import numpy as np
-from ultralytics import YOLO
-import webcolors
-from sklearn.cluster import KMeans
+import config
+from backends import DetectorBackend, create_backend
+from dominant_color import DominantColorEngine
+from color_classifier import ColorClassifier
+from tracker import VehicleTracker
+from renderer import render_detections
+from metrics import Metrics
+from resize_policy import ResizePolicy
+from result_cache import ResultCache
+from tiling import TiledInference
+
+# Names of the COCO classes the detector reports
+CLASS_NAMES = {
+    config.PERSON_CLASS_ID: 'person',
+    config.CAR_CLASS_ID: 'car',
+    config.MOTORCYCLE_CLASS_ID: 'motorcycle',
+    config.BUS_CLASS_ID: 'bus',
+    config.TRUCK_CLASS_ID: 'truck'
+}
 
 class CarColorDetector:
-    def __init__(self):
-        # Load YOLO model
-        self.model = YOLO('yolov8n.pt')  # Will download if not present
-        
-        # Define color ranges in HSV
-        self.color_ranges = {
-            'blue': [(100, 50, 50), (130, 255, 255)],
-            'red': [(0, 50, 50), (10, 255, 255)],
-            'red2': [(170, 50, 50), (180, 255, 255)],  # Red wraps around
-            'green': [(40, 50, 50), (80, 255, 255)],
-            'yellow': [(20, 50, 50), (40, 255, 255)],
-            'white': [(0, 0, 200), (180, 30, 255)],
-            'black': [(0, 0, 0), (180, 255, 50)],
-            'gray': [(0, 0, 50), (180, 30, 200)]
-        }
+    def __init__(self, backend=None):
+        # Detector backend from config.py (or a backend name/instance),
+        # its model is loaded on first use or by warm_up()
+        self.backend = backend if isinstance(backend, DetectorBackend) else create_backend(backend)
         
-    def detect_dominant_color(self, image_section):
-        """Detect the dominant color in an image section using K-means clustering"""
-        # Reshape image to be a list of pixels
-        pixels = image_section.reshape((-1, 3))
+        # Dominant color strategy is picked in config.py
+        self.color_engine = DominantColorEngine()
+        
+        # HSV color ranges from config.py, compiled into lookup tables
+        self.color_classifier = ColorClassifier()
+        
+        # Vehicle tracker, only active between start_tracking and stop_tracking
+        self.tracker = None
+        
+        # Vehicle classes that are color-analysed and counted as cars
+        self.vehicle_class_ids = [config.CAR_CLASS_ID]
+        if config.INCLUDE_OTHER_VEHICLES:
+            self.vehicle_class_ids += [config.MOTORCYCLE_CLASS_ID, config.BUS_CLASS_ID, config.TRUCK_CLASS_ID]
+            
+        # Large images split into overlapping tiles for detection (None = off)
+        self.tiling = TiledInference() if config.TILED_INFERENCE else None
+        
+        # Oversized inputs are downscaled once to config.ANALYSIS_MAX_SIDE
+        self.resize_policy = ResizePolicy()
+        
+        # Region-of-interest zones (a zones.ZoneSet); when set, only their crop is analysed
+        self.zones = None
+        
+        # Stage timers and counters (see metrics.py)
+        self.metrics = Metrics()
+        
+        # Results of frames already analysed with the same settings (None = off)
+        self.result_cache = ResultCache() if config.RESULT_CACHE_ENABLED else None
+        
+    @property
+    def model_loaded(self):
+        return self.backend.loaded
+        
+    def load_model(self):
+        """Load the backend's model if it is not loaded yet"""
+        self.backend.load()
+        
+    def warm_up(self, progress=None):
+        """
+        Load the model and run one dummy inference so the first real frame is fast
         
-        # Apply K-means clustering to find dominant colors
-        kmeans = KMeans(n_clusters=3, random_state=42, n_init=10)
-        kmeans.fit(pixels)
+        Args:
+            progress: Optional callback called as progress(message, fraction)
+        """
+        if progress:
+            progress("Loading detection model...", 0.1)
+        self.load_model()
         
-        # Get the most dominant color (center with most points)
-        labels = kmeans.labels_
-        dominant_color = kmeans.cluster_centers_[np.argmax(np.bincount(labels))]
+        if progress:
+            progress("Warming up...", 0.6)
+        self.analyze_image(np.zeros((config.DISPLAY_HEIGHT, config.DISPLAY_WIDTH, 3), dtype=np.uint8))
         
-        return dominant_color.astype(int)
+        if progress:
+            progress("Ready", 1.0)
+            
+    @property
+    def color_ranges(self):
+        return self.color_classifier.color_ranges
+        
+    @color_ranges.setter
+    def color_ranges(self, color_ranges):
+        self.color_classifier.color_ranges = color_ranges
+        
+    def detect_dominant_color(self, image_section):
+        """Detect the dominant color in an image section using the configured engine"""
+        return self.color_engine(image_section)
         
     def classify_color(self, bgr_color):
         """Classify BGR color into predefined categories"""
-        # Convert BGR to HSV
-        hsv_color = cv2.cvtColor(np.uint8([[bgr_color]]), cv2.COLOR_BGR2HSV)[0][0]
-        
-        # Check each color range
-        for color_name, (lower, upper) in self.color_ranges.items():
-            if color_name == 'red2':  # Handle red wrap-around
-                if (hsv_color[0] >= lower[0] and hsv_color[0] <= upper[0] and
-                    hsv_color[1] >= lower[1] and hsv_color[1] <= upper[1] and
-                    hsv_color[2] >= lower[2] and hsv_color[2] <= upper[2]):
-                    return 'red'
-            else:
-                if (hsv_color[0] >= lower[0] and hsv_color[0] <= upper[0] and
-                    hsv_color[1] >= lower[1] and hsv_color[1] <= upper[1] and
-                    hsv_color[2] >= lower[2] and hsv_color[2] <= upper[2]):
-                    return color_name
-        
-        return 'other'
+        return self.color_classifier.classify_one(bgr_color)
+        
+    def classify_colors(self, bgr_colors):
+        """Classify an array of BGR colors into predefined categories in one call"""
+        return self.color_classifier.classify(bgr_colors)
         
     def process_image(self, image):
-        """Process image to detect cars, people, and colors"""
-        original = image.copy()
+        """Process image to detect cars, people, and colors, drawing the detections onto it"""
+        return self.process_batch([image])[0]
         
-        # Run YOLO detection
-        results = self.model(image)
+    def process_batch(self, images, batch_size=None):
+        """Process a list of images, sending up to batch_size images to YOLO per call"""
+        return list(self.iter_process(images, batch_size))
         
-        # Initialize counters
-        car_count = 0
-        blue_car_count = 0
-        other_car_count = 0
-        people_count = 0
-        car_colors = {}
-        car_confidences = []
-        person_confidences = []
-        
-        # Process detections
-        for result in results:
-            boxes = result.boxes
-            if boxes is not None:
-                for box in boxes:
-                    # Get class and confidence
-                    cls = int(box.cls[0])
-                    conf = float(box.conf[0])
-                    
-                    # Get bounding box coordinates
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
+    def iter_process(self, images, batch_size=None):
+        """Generator version of process_batch that yields (image, analysis_results) per image"""
+        for chunk in self._chunks(images, batch_size):
+            for image, (detections, analysis_results) in zip(chunk, self._analyze_chunk(chunk)):
+                with self.metrics.timer('draw'):
+                    render_detections(image, detections, analysis_results, zones=self.zones)
+                yield image, analysis_results
+                
+    def analyze_image(self, image):
+        """
+        Detect cars, people and colors without copying or drawing on the image
+        
+        Returns:
+            tuple: (list of detection dicts, analysis_results)
+        """
+        return self.analyze_batch([image])[0]
+        
+    def analyze_batch(self, images, batch_size=None):
+        """Analyse a list of images, sending up to batch_size images to YOLO per call"""
+        return list(self.iter_analyze(images, batch_size))
+        
+    def iter_analyze(self, images, batch_size=None):
+        """Generator version of analyze_batch that yields (detections, analysis_results) per image"""
+        for chunk in self._chunks(images, batch_size):
+            yield from self._analyze_chunk(chunk)
+            
+    def _chunks(self, images, batch_size=None):
+        """Group an iterable of images into lists of up to batch_size"""
+        batch_size = batch_size or config.BATCH_SIZE
+        batch = []
+        
+        for image in images:
+            batch.append(image)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+                
+        if batch:
+            yield batch
+            
+    def _analyze_chunk(self, images):
+        """Analyse a list of images, answering frames seen before from the result cache"""
+        # Tracking results depend on earlier frames, so they are never cached
+        if self.result_cache is None or self.tracker is not None:
+            yield from self._run_chunk(images)
+            return
+            
+        fingerprint = self.config_fingerprint()
+        self.result_cache.validate(fingerprint)
+        keys = [ResultCache.key(image, fingerprint) for image in images]
+        cached = [self.result_cache.get(key) for key in keys]
+        
+        misses = [image for image, result in zip(images, cached) if result is None]
+        self.metrics.increment('cache_hits', len(images) - len(misses))
+        self.metrics.increment('cache_misses', len(misses))
+        computed = self._run_chunk(misses) if misses else iter(())
+        
+        for key, result in zip(keys, cached):
+            if result is None:
+                result = next(computed)
+                self.result_cache.put(key, result)
+            yield result
+            
+    def config_fingerprint(self):
+        """Return a string of every setting that changes the analysis results"""
+        return repr((
+            self.backend.name,
+            getattr(self.backend, 'model_path', None),
+            getattr(self.backend, 'input_size', None),
+            getattr(self.backend, 'precision', None),
+            config.CONFIDENCE_THRESHOLD,
+            config.NMS_IOU_THRESHOLD,
+            self.vehicle_class_ids,
+            self.resize_policy.max_side,
+            self.color_engine.method,
+            self.color_engine.n_clusters,
+            self.color_engine.max_pixels,
+            self.color_engine.histogram_bins,
+            sorted(self.color_ranges.items()),
+            repr(self.zones),
+            repr(self.tiling)
+        ))
+        
+    def _run_chunk(self, images):
+        """Run one YOLO call over a list of images and analyse all their cars together"""
+        with self.metrics.timer('resize'):
+            working, transforms = self.prepare_images(images)
+        with self.metrics.timer('inference'):
+            results = self.detect_objects(working, self.inference_size(images))
+        with self.metrics.timer('color'):
+            analyses, unique_counts = self.analyze_detections(working, results)
+        self.restore_coordinates(analyses, transforms, images)
+            
+        self.metrics.increment('frames', len(images))
+        self.metrics.increment('detections', sum(len(detections) for detections in analyses))
+        
+        for detections, counts in zip(analyses, unique_counts):
+            yield detections, self.summarize(detections, counts)
+            
+    def prepare_images(self, images):
+        """
+        Crop images to the active zones and downscale oversized ones, once for
+        inference and color sampling
+        
+        Returns:
+            tuple: (list of working images, list of (working / crop scale,
+            crop offset, crop shape) transforms for restore_coordinates)
+        """
+        working, transforms = [], []
+        for image in images:
+            offset = (0, 0)
+            if self.zones is not None:
+                x1, y1, x2, y2 = self.zones.crop_box(image.shape)
+                image, offset = image[y1:y2, x1:x2], (x1, y1)
+            prepared, scale = self.resize_policy.prepare(image)
+            working.append(prepared)
+            transforms.append((scale, offset, image.shape))
+        return working, transforms
+        
+    def restore_coordinates(self, analyses, transforms, originals):
+        """
+        Map detection boxes from the working images back to the original images, in place
+        
+        With zones active, detections are also assigned to their zone and
+        those outside every zone are dropped.
+        """
+        for detections, (scale, (x_offset, y_offset), crop_shape), original in zip(analyses, transforms, originals):
+            for detection in detections:
+                x1, y1, x2, y2 = self.resize_policy.map_box(detection['box'], scale, crop_shape)
+                detection['box'] = (x1 + x_offset, y1 + y_offset, x2 + x_offset, y2 + y_offset)
+            if self.zones is not None:
+                self.zones.assign(detections, original.shape)
+                
+    def inference_size(self, images):
+        """
+        Model input size that keeps zone crops at the pixel scale of the full frame
+        
+        A crop is not enlarged to the full input size, so inference cost falls
+        roughly with the area outside the zones. None without zones.
+        """
+        if self.zones is None or not images:
+            return None
+        ratio = 0.0
+        for image in images:
+            x1, y1, x2, y2 = self.zones.crop_box(image.shape)
+            ratio = max(ratio, max(x2 - x1, y2 - y1) / max(image.shape[:2]))
+        return max(32, int(np.ceil(config.INFERENCE_SIZE * ratio / 32)) * 32)
+        
+    def detect_objects(self, images, input_size=None):
+        """
+        Run detection on a list of images in one backend call, returning Detections per image
+        
+        Only people and vehicles above config.CONFIDENCE_THRESHOLD are requested from the model.
+        With tiling on, large images are detected tile by tile and merged.
+        """
+        classes = [config.PERSON_CLASS_ID] + self.vehicle_class_ids
+        if self.tiling is not None:
+            return self.tiling.detect(self.backend, images, conf=config.CONFIDENCE_THRESHOLD,
+                                      classes=classes, input_size=input_size)
+        return self.backend.detect(images, conf=config.CONFIDENCE_THRESHOLD, classes=classes,
+                                   input_size=input_size)
+        
+    def analyze_detections(self, images, results):
+        """
+        Find the cars and people in backend Detections and classify the car colors
+        
+        The fresh dominant colors of each image are classified in one call.
+        When tracking is on, tracked cars reuse their cached color until it is
+        stale, and the tracker's unique counts are copied after every image so
+        each image reports only the vehicles counted by then.
+        
+        Returns:
+            (analyses, unique_counts): one list of detection dicts per image,
+            each with box, class_id, class_name, confidence, color_bgr,
+            color_name and track_id, and one copy of tracker.unique_counts per
+            image (None when tracking is off)
+        """
+        analyses = []
+        unique_counts = []
+        
+        for image, result in zip(images, results):
+            pending = []  # (detection, track) for every fresh dominant color
+            vehicles, people = self._collect_detections(result, image.shape)
+            car_boxes = vehicles[0].tolist()
+            tracks = self.tracker.update(car_boxes) if self.tracker is not None else [None] * len(car_boxes)
+            
+            detections = []
+            for (x1, y1, x2, y2), conf, class_id, track in zip(car_boxes, vehicles[1].tolist(),
+                                                               vehicles[2].tolist(), tracks):
+                detection = self._detection((x1, y1, x2, y2), class_id, CLASS_NAMES[class_id], conf)
+                if track is not None:
+                    detection['track_id'] = track.track_id
+                    detection['color_bgr'] = track.color_bgr
                     
-                    # Check if detection is a car (class 2 in COCO dataset)
-                    if cls == 2 and conf > 0.5:  # Car
-                        car_count += 1
-                        car_confidences.append(conf)
-                        
-                        # Extract car region for color analysis
-                        car_region = original[y1:y2, x1:x2]
-                        
-                        if car_region.size > 0:
-                            # Get dominant color
-                            dominant_color_bgr = self.detect_dominant_color(car_region)
-                            color_name = self.classify_color(dominant_color_bgr)
-                            
-                            # Count colors
-                            car_colors[color_name] = car_colors.get(color_name, 0) + 1
+                if track is None or self.tracker.needs_color(track):
+                    # Extract car region for color analysis
+                    car_region = image[y1:y2, x1:x2]
+                    if car_region.size > 0:
+                        detection['color_bgr'] = tuple(int(c) for c in self.detect_dominant_color(car_region))
+                        pending.append((detection, track))
+                        if track is not None:
+                            self.tracker.mark_color_pending(track)
                             
-                            # Draw rectangles based on color
-                            if color_name == 'blue':
-                                # Red rectangle for blue cars
-                                cv2.rectangle(image, (x1, y1), (x2, y2), (0, 0, 255), 3)
-                                blue_car_count += 1
-                                label = f"Blue Car ({conf:.2f})"
-                                cv2.putText(image, label, (x1, y1-10), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-                            else:
-                                # Blue rectangle for other color cars
-                                cv2.rectangle(image, (x1, y1), (x2, y2), (255, 0, 0), 3)
-                                other_car_count += 1
-                                label = f"{color_name.title()} Car ({conf:.2f})"
-                                cv2.putText(image, label, (x1, y1-10), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+                detections.append(detection)
+                
+            for box, conf in zip(people[0].tolist(), people[1].tolist()):
+                detections.append(self._detection(tuple(box), config.PERSON_CLASS_ID, 'person', conf))
+                
+            # Colors are set on the tracks before the next image is matched,
+            # so the tracker counts vehicles on the same image as one by one
+            color_names = self.classify_colors([detection['color_bgr'] for detection, _ in pending])
+            for (detection, track), color_name in zip(pending, color_names):
+                detection['color_name'] = str(color_name)
+                if track is not None:
+                    self.tracker.set_color(track, detection['color_bgr'], detection['color_name'])
+                    
+            # Tracked cars take their track's latest color
+            for detection, track in zip(detections, tracks):
+                if track is not None:
+                    detection['color_bgr'] = track.color_bgr
+                    detection['color_name'] = track.color_name
                     
-                    # Check if detection is a person (class 0 in COCO dataset)
-                    elif cls == 0 and conf > 0.5:  # Person
-                        people_count += 1
-                        person_confidences.append(conf)
-                        
-                        # Draw green rectangle for people
-                        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                        label = f"Person ({conf:.2f})"
-                        cv2.putText(image, label, (x1, y1-10), 
-                                  cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-        
-        # Add summary text to image
-        summary_y = 30
-        cv2.putText(image, f"Cars: {car_count} | Blue Cars: {blue_car_count} | Other Cars: {other_car_count}", 
-                    (10, summary_y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        cv2.putText(image, f"People: {people_count}", 
-                    (10, summary_y + 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-        
-        # Prepare results dictionary
+            analyses.append(detections)
+            unique_counts.append(dict(self.tracker.unique_counts) if self.tracker is not None else None)
+            
+        return analyses, unique_counts
+        
+    def _detection(self, box, class_id, class_name, confidence):
+        return {
+            'box': box,
+            'class_id': class_id,
+            'class_name': class_name,
+            'confidence': confidence,
+            'color_bgr': None,
+            'color_name': None,
+            'track_id': None,
+            'zone': None
+        }
+        
+    def start_tracking(self):
+        """Start a tracking session: stable car IDs, cached colors and unique counts"""
+        self.tracker = VehicleTracker()
+        
+    def stop_tracking(self):
+        """End the tracking session"""
+        self.tracker = None
+        
+    def _collect_detections(self, detections, image_shape):
+        """
+        Filter one image's Detections to vehicles and people with array operations
+        
+        Returns:
+            tuple: ((vehicle boxes, confidences, class IDs), (person boxes, confidences)),
+            with boxes clipped to the image and truncated to int
+        """
+        keep = detections.confidences > config.CONFIDENCE_THRESHOLD
+        class_ids = detections.class_ids[keep]
+        confidences = detections.confidences[keep]
+        
+        height, width = image_shape[:2]
+        boxes = np.clip(detections.boxes[keep], 0, [width, height, width, height]).astype(np.int32)
+        
+        vehicle = np.isin(class_ids, self.vehicle_class_ids)
+        person = class_ids == config.PERSON_CLASS_ID
+        return (boxes[vehicle], confidences[vehicle], class_ids[vehicle]), (boxes[person], confidences[person])
+        
+    def summarize(self, detections, unique_counts=None):
+        """
+        Count one image's detections into the analysis_results dict
+        
+        Args:
+            detections: Detections of one image from analyze_detections
+            unique_counts: Snapshot of tracker.unique_counts taken when the
+                detections were analysed; read from the tracker if None
+        """
+        cars = [d for d in detections if d['class_name'] != 'person']
+        people = [d for d in detections if d['class_name'] == 'person']
+        
+        car_colors = {}
+        for car in cars:
+            if car['color_name'] is not None:
+                car_colors[car['color_name']] = car_colors.get(car['color_name'], 0) + 1
+        blue_car_count = car_colors.get('blue', 0)
+        
         analysis_results = {
-            'total_cars': car_count,
+            'total_cars': len(cars),
             'blue_cars': blue_car_count,
-            'other_cars': other_car_count,
-            'total_people': people_count,
+            'other_cars': sum(car_colors.values()) - blue_car_count,
+            'total_people': len(people),
             'car_colors': car_colors,
-            'avg_car_confidence': np.mean(car_confidences) if car_confidences else 0,
-            'avg_person_confidence': np.mean(person_confidences) if person_confidences else 0
+            'avg_car_confidence': np.mean([car['confidence'] for car in cars]) if cars else 0,
+            'avg_person_confidence': np.mean([person['confidence'] for person in people]) if people else 0
         }
         
-        return image, analysis_results
+        # Cars per color and people in each zone
+        if self.zones is not None:
+            analysis_results['zones'] = self.zones.summarize(detections)
+            
+        # Unique vehicles seen over the tracking session
+        if self.tracker is not None:
+            if unique_counts is None:
+                unique_counts = self.tracker.unique_counts
+            analysis_results['unique_cars'] = sum(unique_counts.values())
+            analysis_results['unique_car_colors'] = dict(unique_counts)
+            
+        return analysis_results
@@ -0,0 +1,74 @@
+"""
+Lookup Table Color Classifier for Car Color Detection System
+This module compiles the HSV color ranges into lookup tables so a whole
+array of colors can be classified in one vectorised call
+"""
+
+import cv2
+import numpy as np
+
+import config
+
+
+class ColorClassifier:
+    """Classify BGR colors into the named HSV ranges
+
+    Each HSV channel gets a 256 x (ranges + 1) boolean table saying which
+    ranges accept that channel value. A color matches a range when all three
+    channel lookups agree, and the first matching range wins, in the same
+    order as the ranges dict. The last column is always true and maps to
+    'other'. Range names ending in a digit (e.g. 'red2' for the hue
+    wrap-around) are reported under their base name.
+
+    The tables are rebuilt automatically whenever the ranges change.
+    """
+
+    def __init__(self, color_ranges=None):
+        # Copied so changing one classifier's ranges leaves config.COLOR_RANGES alone
+        color_ranges = color_ranges if color_ranges is not None else config.COLOR_RANGES
+        self.color_ranges = {name: list(bounds) for name, bounds in color_ranges.items()}
+        self._compiled_key = None
+
+    def classify(self, bgr_colors):
+        """
+        Classify an array of BGR colors
+
+        Args:
+            bgr_colors: Array-like of shape (N, 3)
+
+        Returns:
+            NumPy array of N color names
+        """
+        self._ensure_compiled()
+
+        colors = np.asarray(bgr_colors).reshape(-1, 3)
+        if len(colors) == 0:
+            return np.empty(0, dtype=object)
+
+        colors = np.clip(colors, 0, 255).astype(np.uint8).reshape(-1, 1, 3)
+        hsv = cv2.cvtColor(colors, cv2.COLOR_BGR2HSV).reshape(-1, 3)
+
+        inside = self._h_table[hsv[:, 0]] & self._s_table[hsv[:, 1]] & self._v_table[hsv[:, 2]]
+        return self._labels[np.argmax(inside, axis=1)]
+
+    def classify_one(self, bgr_color):
+        """Classify a single BGR color"""
+        return str(self.classify([bgr_color])[0])
+
+    def _ensure_compiled(self):
+        key = tuple((name, tuple(map(tuple, bounds))) for name, bounds in self.color_ranges.items())
+        if key != self._compiled_key:
+            self._compile(key)
+
+    def _compile(self, key):
+        values = np.arange(256)
+        tables = [np.ones((256, len(key) + 1), dtype=bool) for _ in range(3)]
+
+        for column, (_, (lower, upper)) in enumerate(key):
+            for channel in range(3):
+                tables[channel][:, column] = (values >= lower[channel]) & (values <= upper[channel])
+
+        self._h_table, self._s_table, self._v_table = tables
+        self._labels = np.array([name.rstrip('0123456789') for name, _ in key] + ['other'],
+                                dtype=object)
+        self._compiled_key = key
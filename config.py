@@ -6,6 +6,12 @@ Modify these values to customize the application behavior
 # Detection Settings
 CONFIDENCE_THRESHOLD = 0.5  # Minimum confidence for detections (0.0 to 1.0)
 YOLO_MODEL = 'yolov8n.pt'  # Model options: yolov8n.pt, yolov8s.pt, yolov8m.pt
+DETECTOR_BACKEND = 'ultralytics'  # Options: ultralytics, onnxruntime, stub (testing only)
+ONNX_MODEL = 'yolov8n.onnx'  # Exported with: yolo export model=yolov8n.pt format=onnx (INT8/FP16: quantize.py)
+ONNX_THREADS = 0  # ONNX Runtime intra-op threads (0 = runtime default)
+INFERENCE_SIZE = 640  # Square model input size in pixels
+NMS_IOU_THRESHOLD = 0.45  # Overlap above which the weaker of two boxes is suppressed
+TORCH_PRECISION = 'fp32'  # ultralytics backend: fp32, fp16 (GPU only) or bf16 (CPU autocast)
 
 # Display Settings
 DISPLAY_WIDTH = 400  # Width for image display in GUI
@@ -22,6 +28,17 @@ RECTANGLE_THICKNESS = 3
 # Color Detection Settings
 KMEANS_CLUSTERS = 3  # Number of clusters for K-means color detection
 COLOR_CONFIDENCE_THRESHOLD = 0.3  # Minimum color presence to be considered
+DOMINANT_COLOR_METHOD = 'cv2_kmeans'  # Options: kmeans, minibatch, cv2_kmeans, histogram
+COLOR_SAMPLE_MAX_PIXELS = 4096  # Max pixels sampled per car (None = use every pixel)
+COLOR_HISTOGRAM_BINS = 8  # Levels per channel for the histogram method
+
+# Tracking Settings (webcam and video sessions)
+ENABLE_TRACKING = True  # Track cars across frames, cache their colors and count unique vehicles
+TRACK_IOU_THRESHOLD = 0.3  # Minimum box overlap to match a car to its track
+TRACK_MAX_AGE = 15  # Frames a lost track is kept before it is dropped
+TRACK_MIN_HITS = 3  # Frames a track must be seen before it is counted as a vehicle
+COLOR_REFRESH_FRAMES = 30  # Re-run color analysis for a tracked car every N frames
+COLOR_REFRESH_IOU = 0.5  # ...or when its box overlaps the last analysed box less than this
 
 # HSV Color Ranges (Hue, Saturation, Value)
 COLOR_RANGES = {
@@ -38,6 +55,10 @@ COLOR_RANGES = {
 # COCO Dataset Class IDs
 PERSON_CLASS_ID = 0
 CAR_CLASS_ID = 2
+MOTORCYCLE_CLASS_ID = 3
+BUS_CLASS_ID = 5
+TRUCK_CLASS_ID = 7
+INCLUDE_OTHER_VEHICLES = False  # Also color and count motorcycles, buses and trucks as cars
 
 # GUI Settings
 WINDOW_TITLE = "Car Color Detection & Traffic Analysis"
@@ -47,18 +68,90 @@ WINDOW_HEIGHT = 800
 # Webcam Settings
 WEBCAM_INDEX = 0  # Change to 1, 2, etc. if default camera doesn't work
 WEBCAM_FPS = 30  # Frames per second for webcam capture
+DISPLAY_FPS = 15  # Most webcam redraws per second in the GUI
+
+# Region-of-Interest Zones
+# Polygons per camera ('webcam <index>') or video file path, with (x, y) points as
+# fractions of the frame size; only their bounding crop is analysed (see zones.py)
+ZONES = {}
+ZONE_CROP_MARGIN = 32  # Pixels added around the zones' bounding box so vehicles at the edges are seen whole
+ZONE_COLOR = (0, 255, 255)  # Yellow zone outlines in BGR
+
+# Motion Gating Settings
+MOTION_GATING = True  # Reuse the previous webcam result while the scene is static
+MOTION_THRESHOLD = 0.005  # Fraction of thumbnail pixels that must change to run detection again
+MOTION_PIXEL_THRESHOLD = 25  # Gray level difference that counts a thumbnail pixel as changed
+MOTION_MAX_INTERVAL = 2.0  # Seconds after which detection runs again even on a static scene
+MOTION_THUMBNAIL_WIDTH = 160  # Width of the grayscale copy frames are compared at
 
 # Text Display Settings
-FONT = 1  # cv2.FONT_HERSHEY_SIMPLEX
+FONT = 0  # cv2.FONT_HERSHEY_SIMPLEX
 FONT_SCALE = 0.6
 FONT_THICKNESS = 2
 TEXT_COLOR = (255, 255, 255)  # White
 
 # Performance Settings
 ENABLE_GPU = False  # Set to True if you have CUDA-capable GPU
+BATCH_SIZE = 8  # Images sent to YOLO per call by CarColorDetector.process_batch
+MICRO_BATCH_SIZE = 8  # Most frames MicroBatcher groups into one detector call
+MICRO_BATCH_WAIT_MS = 10  # Longest a queued frame waits for its batch to fill
+
+# Quantisation Settings (see quantize.py)
+QUANT_CALIBRATION_IMAGES = 200  # Most images from the calibration folder used for INT8 ranges
+QUANT_EXCLUDE_HEAD = True  # Keep the detection head in float, so box coordinates stay accurate
+
+# Camera Pool Settings (see camera_pool.py)
+CAMERA_SOURCES = [0]  # Webcam indexes or video files analysed by camera_pool.py
+POOL_WORKERS = 2  # Detector worker processes, each loads the model once
+POOL_RING_SLOTS = 4  # Frames buffered per camera in shared memory
+POOL_CAMERA_INFLIGHT = 2  # Most frames of one camera being analysed at once
+POOL_WORKER_BATCH = 4  # Most queued frames a worker analyses in one detector call
+
+# Result Cache Settings
+RESULT_CACHE_ENABLED = True  # Reuse results for frames already analysed with the same settings
+RESULT_CACHE_ENTRIES = 256  # Most results kept in memory
+RESULT_CACHE_MB = 64  # Most memory used by cached results
+RESULT_CACHE_DIR = None  # Also keep results in this directory across runs (None = memory only)
+RESULT_CACHE_DISK_MB = 1024  # Most disk used by RESULT_CACHE_DIR, least recently used files are removed first
+
+# Video File Settings
+VIDEO_QUEUE_SIZE = 8  # Maximum frames waiting between two pipeline stages
+VIDEO_FOURCC = 'mp4v'  # Codec for annotated output videos
 MAX_IMAGE_SIZE = 4000  # Maximum width/height in pixels
+ANALYSIS_MAX_SIDE = 1920  # Larger inputs are downscaled once for inference and color sampling (None = never)
 MIN_IMAGE_SIZE = 100  # Minimum width/height in pixels
 
+# Tiled Inference Settings (see tiling.py)
+TILED_INFERENCE = False  # Detect on overlapping tiles of large images, for small distant vehicles
+TILE_SIZE = 640  # Tile width and height in pixels
+TILE_OVERLAP = 128  # Minimum overlap of neighbouring tiles, above the size of the smallest vehicles
+TILE_MIN_SIDE = 1280  # Only images with a longer side than this are tiled
+TILE_FULL_FRAME = True  # Also run one full-frame pass for vehicles larger than the overlap
+TILE_BATCH_SIZE = 16  # Most tiles sent to the backend per call
+
+# Traffic Statistics Settings
+TRAFFIC_STATS_WINDOWS = {'1 min': 60, '15 min': 900, '1 hour': 3600}  # Rolling windows in seconds
+TRAFFIC_STATS_INTERVAL = 5  # Seconds between rolling statistics snapshots in the results panel
+
+# Detection Log Settings
+DETECTION_LOG_ENABLED = False  # Record every GUI detection in the SQLite detection log
+DETECTION_LOG_PATH = 'detections.db'  # SQLite database file (WAL mode)
+DETECTION_LOG_BATCH = 500  # Most rows written per transaction
+DETECTION_LOG_FLUSH_SECONDS = 1.0  # Longest a queued row waits before its batch is written
+DETECTION_LOG_QUEUE = 100000  # Rows waiting to be written before new ones are dropped
+
+# Metrics Settings
+METRICS_WINDOW = 1024  # Latency samples kept per stage for the p50/p95/p99 percentiles
+METRICS_PORT = None  # Serve Prometheus metrics on http://127.0.0.1:<port>/metrics (None = off)
+
+# HTTP Service Settings
+SERVER_HOST = '127.0.0.1'  # Interface server.py listens on
+SERVER_PORT = 8080  # Port server.py listens on
+SERVER_WORKERS = 1  # Inference threads sharing the one loaded model (its forward passes take turns)
+SERVER_MAX_QUEUE = 16  # Requests waiting for inference before new ones are refused with 503
+SERVER_MAX_BODY_MB = 25  # Largest accepted upload
+SERVER_MICRO_BATCH = False  # Batch concurrent requests through MicroBatcher instead of one call each
+
 # File Settings
 SUPPORTED_IMAGE_FORMATS = [
     ("Image files", "*.jpg *.jpeg *.png *.bmp *.gif *.tiff")
@@ -0,0 +1,277 @@
+"""
+Detection Log for Car Color Detection System
+Records every detection to a local SQLite database in WAL mode. Rows are
+queued by the caller and written in batched transactions by a background
+thread, so the inference loop never waits for the disk
+
+Example:
+    log = DetectionLog('detections.db')
+    log.record(detections, source='webcam 0')
+    log.count_vehicles(t1, t2, color='blue')   # blue cars per hour
+    log.export('detections.csv', t1, t2)
+
+Usage:
+    python detection_log.py hourly --color blue --start 2024-05-01T08:00 --end 2024-05-01T18:00
+    python detection_log.py export detections.parquet --start 2024-05-01
+"""
+
+import argparse
+import csv
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from datetime import datetime
+
+import config
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    source TEXT NOT NULL,
+    session TEXT,
+    track_id INTEGER,
+    class_name TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    color_name TEXT,
+    x1 INTEGER NOT NULL,
+    y1 INTEGER NOT NULL,
+    x2 INTEGER NOT NULL,
+    y2 INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_time ON detections (timestamp);
+CREATE INDEX IF NOT EXISTS detections_color_time ON detections (class_name, color_name, timestamp);
+CREATE INDEX IF NOT EXISTS detections_source_time ON detections (source, timestamp);
+"""
+
+COLUMNS = ['timestamp', 'source', 'session', 'track_id', 'class_name', 'confidence', 'color_name',
+           'x1', 'y1', 'x2', 'y2']
+
+
+def connect(path):
+    """Open the database in WAL mode, creating the table and indexes if needed"""
+    connection = sqlite3.connect(path, timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class DetectionLog:
+    """SQLite detection log with a background batch writer"""
+
+    def __init__(self, path=None, batch_size=None, flush_interval=None, max_queue=None):
+        self.path = path or config.DETECTION_LOG_PATH
+        self.batch_size = batch_size or config.DETECTION_LOG_BATCH
+        self.flush_interval = flush_interval or config.DETECTION_LOG_FLUSH_SECONDS
+
+        self.written = 0
+        self.dropped = 0
+
+        connect(self.path).close()
+        self._queue = queue.Queue(maxsize=max_queue or config.DETECTION_LOG_QUEUE)
+        self._thread = threading.Thread(target=self._writer, name='detection-log', daemon=True)
+        self._thread.start()
+
+    def record(self, detections, source, timestamp=None, session=None):
+        """
+        Queue one frame's detections for writing (never blocks)
+
+        Args:
+            detections: Detection dicts from CarColorDetector.analyze_image
+                        (or their serialize_detections form)
+            source: Image path, camera name or video file
+            timestamp: Time of the frame in seconds since the epoch (None for now)
+            session: Tracking session, so track IDs from different sessions are not merged
+
+        Returns:
+            Number of detections queued; the rest were dropped because the queue was full
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        queued = 0
+        for detection in detections:
+            x1, y1, x2, y2 = (int(v) for v in detection['box'])
+            row = (timestamp, source, session, detection['track_id'], detection['class_name'],
+                   float(detection['confidence']), detection['color_name'], x1, y1, x2, y2)
+            try:
+                self._queue.put_nowait(row)
+                queued += 1
+            except queue.Full:
+                self.dropped += 1
+        return queued
+
+    def _writer(self):
+        connection = connect(self.path)
+        stopping = False
+        while not stopping:
+            try:
+                rows = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                continue
+
+            # Collect a batch until it is full or flush_interval has passed
+            deadline = time.perf_counter() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get(timeout=max(deadline - time.perf_counter(), 0)))
+                except queue.Empty:
+                    break
+
+            if None in rows:
+                stopping = True
+            batch = [row for row in rows if row is not None]
+            try:
+                with connection:
+                    connection.executemany(
+                        f"INSERT INTO detections ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        batch)
+                self.written += len(batch)
+            except sqlite3.Error as e:
+                print(f"Detection log write failed: {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+        connection.close()
+
+    def flush(self):
+        """Wait until everything queued so far is in the database"""
+        self._queue.join()
+
+    def close(self):
+        """Write the remaining rows and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _where(self, start, end, class_name=None, color=None, source=None):
+        clauses, params = ["timestamp >= ?", "timestamp < ?"], [start, end]
+        if class_name is not None:
+            clauses.append("class_name = ?")
+            params.append(class_name)
+        if color is not None:
+            clauses.append("color_name = ?")
+            params.append(color)
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        return " AND ".join(clauses), params
+
+    def count_vehicles(self, start, end, color=None, class_name='car', source=None, bucket_seconds=3600):
+        """
+        Count vehicles per time bucket, e.g. blue cars per hour between two times
+
+        Tracked vehicles are counted once per bucket they appear in; untracked
+        detections are counted once each.
+
+        Args:
+            start, end: Time range in seconds since the epoch (end excluded)
+            color: Color name to count (None for all)
+            class_name: Class to count (None for all)
+            source: Only count this source (None for all)
+            bucket_seconds: Bucket length, 3600 for per hour
+
+        Returns:
+            List of (bucket start time, count), oldest first, empty buckets left out
+        """
+        where, params = self._where(start, end, class_name, color, source)
+        sql = f"""
+            SELECT CAST(timestamp / ? AS INTEGER) * ? AS bucket,
+                   SUM(track_id IS NULL) +
+                   COUNT(DISTINCT CASE WHEN track_id IS NOT NULL
+                         THEN source || '/' || IFNULL(session, '') || '/' || track_id END)
+            FROM detections WHERE {where}
+            GROUP BY bucket ORDER BY bucket"""
+        return self._read(sql, [bucket_seconds, bucket_seconds] + params)
+
+    def query(self, start, end, color=None, class_name=None, source=None, limit=None):
+        """
+        Return logged detections between two times as dicts, oldest first
+
+        Args:
+            start, end: Time range in seconds since the epoch (end excluded)
+            color, class_name, source: Optional filters
+            limit: Most rows to return (None for all)
+        """
+        where, params = self._where(start, end, class_name, color, source)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM detections WHERE {where} ORDER BY timestamp"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(zip(COLUMNS, row)) for row in self._read(sql, params)]
+
+    def _read(self, sql, params):
+        # Readers use their own connection; WAL lets them run while the writer commits
+        with closing(sqlite3.connect(self.path, timeout=30)) as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def export(self, output_path, start=0, end=float('inf'), **filters):
+        """
+        Export logged detections to CSV, or Parquet when output_path ends in .parquet
+
+        Returns:
+            Number of rows exported
+        """
+        rows = self.query(start, end, **filters)
+
+        if output_path.lower().endswith('.parquet'):
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("Parquet export needs the pyarrow package: pip install pyarrow")
+            table = pyarrow.Table.from_pylist(rows, schema=pyarrow.schema([
+                ('timestamp', pyarrow.float64()), ('source', pyarrow.string()), ('session', pyarrow.string()),
+                ('track_id', pyarrow.int64()), ('class_name', pyarrow.string()), ('confidence', pyarrow.float64()),
+                ('color_name', pyarrow.string()), ('x1', pyarrow.int32()), ('y1', pyarrow.int32()),
+                ('x2', pyarrow.int32()), ('y2', pyarrow.int32())
+            ]))
+            pyarrow.parquet.write_table(table, output_path)
+        else:
+            with open(output_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=COLUMNS)
+                writer.writeheader()
+                writer.writerows(rows)
+
+        return len(rows)
+
+
+def parse_time(value):
+    """Parse an ISO date/time (local time) or seconds since the epoch"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query and export the detection log")
+    parser.add_argument('command', choices=['hourly', 'export'], help="Count vehicles per hour, or export rows")
+    parser.add_argument('output', nargs='?', help="Export file, .csv or .parquet")
+    parser.add_argument('--db', default=config.DETECTION_LOG_PATH, help="Detection log database")
+    parser.add_argument('--start', type=parse_time, default=0, help="ISO time or epoch seconds")
+    parser.add_argument('--end', type=parse_time, default=float('inf'), help="ISO time or epoch seconds")
+    parser.add_argument('--color', default=None, help="Only this color, e.g. blue")
+    parser.add_argument('--class-name', default=None, help="Only this class, e.g. car")
+    parser.add_argument('--source', default=None, help="Only this source")
+    args = parser.parse_args()
+
+    log = DetectionLog(args.db)
+    try:
+        if args.command == 'hourly':
+            for bucket, count in log.count_vehicles(args.start, args.end, args.color, args.class_name or 'car',
+                                                    args.source):
+                # Buckets start on UTC hours, which are not whole local hours in every timezone
+                print(f"{datetime.fromtimestamp(bucket):%Y-%m-%d %H:%M}  {count}")
+        else:
+            if not args.output:
+                parser.error("export needs an output file")
+            count = log.export(args.output, args.start, args.end, color=args.color,
+                               class_name=args.class_name, source=args.source)
+            print(f"Exported {count} detections to {args.output}")
+    finally:
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Dominant Color Engines for Car Color Detection System
+This module provides interchangeable strategies for finding the dominant
+color of a car crop. The strategy is picked through config.py
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+import config
+
+
+class DominantColorEngine:
+    """Find the dominant BGR color of an image section
+
+    Every method first caps the number of pixels it looks at by taking a
+    regular grid of the crop, so cost stays flat as cars get bigger.
+    scikit-learn is only imported by the methods that use it.
+
+    Methods:
+        kmeans: scikit-learn KMeans with 10 inits (original behaviour)
+        minibatch: scikit-learn MiniBatchKMeans with a single init
+        cv2_kmeans: OpenCV k-means with a single k-means++ init
+        histogram: most populated bin of a quantised color histogram
+    """
+
+    METHODS = ('kmeans', 'minibatch', 'cv2_kmeans', 'histogram')
+
+    def __init__(self, method=None, n_clusters=None, max_pixels=None,
+                 histogram_bins=None, random_state=42):
+        self.method = method or config.DOMINANT_COLOR_METHOD
+        if self.method not in self.METHODS:
+            raise ValueError(f"Unknown dominant color method: {self.method}")
+
+        self.n_clusters = n_clusters or config.KMEANS_CLUSTERS
+        self.max_pixels = max_pixels if max_pixels is not None else config.COLOR_SAMPLE_MAX_PIXELS
+        self.histogram_bins = histogram_bins or config.COLOR_HISTOGRAM_BINS
+        self.random_state = random_state
+
+        self._methods = {
+            'kmeans': self._kmeans,
+            'minibatch': self._minibatch,
+            'cv2_kmeans': self._cv2_kmeans,
+            'histogram': self._histogram
+        }
+
+    def __call__(self, image_section):
+        """Return the dominant color of an image section as an int BGR array"""
+        pixels = self.sample_pixels(image_section)
+
+        # Too few pixels to cluster, fall back to the mean color
+        if len(pixels) <= self.n_clusters:
+            return pixels.mean(axis=0).astype(int)
+
+        return self._methods[self.method](pixels)
+
+    def sample_pixels(self, image_section):
+        """Subsample an image section on a regular grid and flatten it to pixels"""
+        if self.max_pixels and image_section.ndim == 3:
+            height, width = image_section.shape[:2]
+            step = math.ceil(math.sqrt(height * width / self.max_pixels))
+            if step > 1:
+                image_section = image_section[::step, ::step]
+
+        return image_section.reshape((-1, 3))
+
+    def _kmeans(self, pixels):
+        from sklearn.cluster import KMeans
+
+        kmeans = KMeans(n_clusters=self.n_clusters, random_state=self.random_state, n_init=10)
+        kmeans.fit(pixels)
+        return self._largest_center(kmeans.labels_, kmeans.cluster_centers_)
+
+    def _minibatch(self, pixels):
+        from sklearn.cluster import MiniBatchKMeans
+
+        kmeans = MiniBatchKMeans(n_clusters=self.n_clusters, random_state=self.random_state,
+                                 n_init=1, batch_size=1024)
+        kmeans.fit(pixels)
+        return self._largest_center(kmeans.labels_, kmeans.cluster_centers_)
+
+    def _cv2_kmeans(self, pixels):
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 10, 1.0)
+        cv2.setRNGSeed(self.random_state)
+        _, labels, centers = cv2.kmeans(np.float32(pixels), self.n_clusters, None,
+                                        criteria, 1, cv2.KMEANS_PP_CENTERS)
+        return self._largest_center(labels.ravel(), centers)
+
+    def _histogram(self, pixels):
+        bins = self.histogram_bins
+        quantised = (pixels.astype(np.int32) * bins) // 256
+        codes = (quantised[:, 0] * bins + quantised[:, 1]) * bins + quantised[:, 2]
+
+        # Average the real pixels of the fullest bin rather than using its centre
+        counts = np.bincount(codes, minlength=bins ** 3)
+        return pixels[codes == np.argmax(counts)].mean(axis=0).astype(int)
+
+    def _largest_center(self, labels, centers):
+        """Return the cluster center with the most points"""
+        counts = np.bincount(labels, minlength=len(centers))
+        return np.asarray(centers)[np.argmax(counts)].astype(int)
@@ -0,0 +1,106 @@
+"""
+Latest-frame-wins webcam capture for Car Color Detection System
+A background thread keeps reading the camera and holds only the newest
+frame, so a slow consumer always gets the freshest frame instead of
+falling behind on frames buffered by the driver
+"""
+
+import threading
+import time
+
+import cv2
+
+import config
+
+
+class LatestFrameCapture:
+    """Read a camera on its own thread, keeping only the newest frame"""
+
+    def __init__(self, index=None, fps=None):
+        self.index = config.WEBCAM_INDEX if index is None else index
+        self.fps = fps or config.WEBCAM_FPS
+
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+
+        self._cap = None
+        self._thread = None
+        self._running = False
+        self._condition = threading.Condition()
+        self._frame = None
+        self._captured_at = 0.0
+        self._sequence = 0
+        self._last_read = 0
+
+    def start(self):
+        """Open the camera and start the capture thread"""
+        self._cap = cv2.VideoCapture(self.index)
+        if not self._cap.isOpened():
+            raise IOError(f"Could not open webcam {self.index}")
+
+        # Keep the driver queue as short as the backend allows
+        self._cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._cap.set(cv2.CAP_PROP_FPS, self.fps)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the capture thread and release the camera"""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        if self._cap is not None:
+            self._cap.release()
+
+    def read(self, timeout=1.0):
+        """
+        Wait for a frame newer than the last one read
+
+        Args:
+            timeout: Seconds to wait for a new frame
+
+        Returns:
+            tuple: (frame, capture time from time.perf_counter()), or None on timeout
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: self._sequence > self._last_read or not self._running, timeout):
+                return None
+            if self._sequence <= self._last_read:
+                return None
+
+            self._last_read = self._sequence
+            return self._frame, self._captured_at
+
+    def stats(self):
+        """Return the capture counters as a dict"""
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+            'read_failures': self.read_failures
+        }
+
+    def _capture_loop(self):
+        while self._running:
+            ret, frame = self._cap.read()
+            if not ret:
+                self.read_failures += 1
+                time.sleep(1.0 / self.fps)
+                continue
+
+            with self._condition:
+                # The previous frame was never read, it is replaced by this one
+                if self._sequence > self._last_read:
+                    self.frames_dropped += 1
+
+                self._frame = frame
+                self._captured_at = time.perf_counter()
+                self._sequence += 1
+                self.frames_captured += 1
+                self._condition.notify_all()
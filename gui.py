@@ -4,8 +4,9 @@ This module provides utility functions for the GUI application
 """
 
 import cv2
-import numpy as np
 from tkinter import messagebox
+from PIL import Image, ImageTk
+import config
 
 def resize_image_for_display(image, target_width=400, target_height=300):
     """
@@ -17,19 +18,49 @@ def resize_image_for_display(image, target_width=400, target_height=300):
         target_height: Target height in pixels
     
     Returns:
-        Resized image
+        Resized image that fits inside target_width x target_height
     """
     height, width = image.shape[:2]
-    aspect_ratio = width / height
+    scale = min(target_width / width, target_height / height)
+    new_width = max(1, round(width * scale))
+    new_height = max(1, round(height * scale))
     
-    if width > height:
-        new_width = target_width
-        new_height = int(target_width / aspect_ratio)
-    else:
-        new_height = target_height
-        new_width = int(target_height * aspect_ratio)
+    # Bilinear is plenty for a preview and many times faster than INTER_AREA
+    return cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+
+class ImagePane:
+    """
+    Shows images in a Tk label through one reused PhotoImage
+    
+    prepare() does the resize and color conversion and may run on any
+    thread; show() only copies the pixels into the PhotoImage, so the Tk
+    main thread does as little work as possible per frame.
+    """
     
-    return cv2.resize(image, (new_width, new_height))
+    def __init__(self, label, width=None, height=None):
+        self.label = label
+        self.width = width or config.DISPLAY_WIDTH
+        self.height = height or config.DISPLAY_HEIGHT
+        self.photo = None
+        
+    def prepare(self, image):
+        """Return an RGB PIL image that fits the pane, keeping the aspect ratio"""
+        display = resize_image_for_display(image, self.width, self.height)
+        return Image.fromarray(cv2.cvtColor(display, cv2.COLOR_BGR2RGB))
+        
+    def show(self, prepared):
+        """Display a prepared image (must be called on the Tk main thread)"""
+        if self.photo is not None and (self.photo.width(), self.photo.height()) == prepared.size:
+            self.photo.paste(prepared)
+        else:
+            # A new PhotoImage is only needed when the displayed size changes
+            self.photo = ImageTk.PhotoImage(prepared)
+            self.label.configure(image=self.photo)
+            
+    def show_image(self, image):
+        """Prepare and display a BGR image"""
+        self.show(self.prepare(image))
 
 
 def validate_image(image):
@@ -49,11 +80,13 @@ def validate_image(image):
         return False, "Image is empty"
     
     height, width = image.shape[:2]
-    if width < 100 or height < 100:
-        return False, "Image is too small (minimum 100x100 pixels)"
+    min_size = config.MIN_IMAGE_SIZE
+    max_size = config.MAX_IMAGE_SIZE
+    if width < min_size or height < min_size:
+        return False, f"Image is too small (minimum {min_size}x{min_size} pixels)"
     
-    if width > 4000 or height > 4000:
-        return False, "Image is too large (maximum 4000x4000 pixels)"
+    if width > max_size or height > max_size:
+        return False, f"Image is too large (maximum {max_size}x{max_size} pixels)"
     
     return True, "Image is valid"
 
@@ -160,30 +193,35 @@ def show_warning_dialog(title, message):
     messagebox.showwarning(title, message)
 
 
-def calculate_statistics(detections):
+def calculate_statistics(window_totals):
     """
-    Calculate additional statistics from detections
+    Calculate rates and averages from one window of rolling traffic totals
     
     Args:
-        detections: List of detection dictionaries
+        window_totals: Dictionary from TrafficStatistics.window
     
     Returns:
         Dictionary with statistics
     """
+    frames = window_totals['frames']
+    cars = window_totals['cars']
+    people = window_totals['people']
+    
     stats = {
-        'total_detections': len(detections),
-        'avg_box_size': 0,
-        'density': 0
+        'frames': frames,
+        'cars_per_frame': cars / frames if frames else 0,
+        'people_per_frame': people / frames if frames else 0,
+        'avg_car_confidence': window_totals['car_confidence_sum'] / cars if cars else 0,
+        'avg_person_confidence': window_totals['person_confidence_sum'] / people if people else 0,
+        'color_share': {},
+        'new_cars': sum(window_totals['new_car_colors'].values()),
+        'new_car_colors': window_totals['new_car_colors']
     }
     
-    if detections:
-        box_sizes = []
-        for det in detections:
-            width = det.get('width', 0)
-            height = det.get('height', 0)
-            box_sizes.append(width * height)
-        
-        stats['avg_box_size'] = np.mean(box_sizes) if box_sizes else 0
+    colored = sum(window_totals['car_colors'].values())
+    if colored:
+        stats['color_share'] = {color: count / colored for color, count in
+                                sorted(window_totals['car_colors'].items(), key=lambda x: x[1], reverse=True)}
     
     return stats
 
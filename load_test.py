@@ -0,0 +1,177 @@
+"""
+HTTP Load Test for Car Color Detection System
+Sends concurrent /detect requests to a running server.py and reports
+throughput, tail latency and how many requests were shed with 503
+
+Synthetic frames differ per request so the server's result cache cannot
+answer them; a fixed --image repeats, so start the server with --no-cache.
+The report lists the cache hits the server counted during the run.
+
+Usage:
+    python load_test.py --concurrency 8 --requests 200
+    python load_test.py --image street.jpg --url http://127.0.0.1:8080/detect
+"""
+
+import argparse
+import http.client
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+import cv2
+import numpy as np
+
+import config
+
+
+def load_payloads(image_path=None, raw=False, frames=32):
+    """
+    Build the request bodies and headers the clients send in turn
+
+    Args:
+        image_path: Image to upload (None for synthetic street scenes)
+        raw: Send raw BGR bytes instead of JPEG
+        frames: Number of different synthetic scenes
+
+    Returns:
+        List of (body bytes, headers dict)
+    """
+    if image_path:
+        image = cv2.imread(image_path)
+        if image is None:
+            raise SystemExit(f"Could not read {image_path}")
+        return [encode_payload(image, raw)]
+
+    from benchmark import make_scene
+    return [encode_payload(make_scene(1280, 720, 12, seed=seed)[0], raw) for seed in range(frames)]
+
+
+def encode_payload(image, raw=False):
+    """Return the (body bytes, headers dict) of one image"""
+    if raw:
+        height, width = image.shape[:2]
+        return image.tobytes(), {'Content-Type': 'application/octet-stream',
+                                 'X-Width': str(width), 'X-Height': str(height)}
+
+    _, encoded = cv2.imencode('.jpg', image)
+    return encoded.tobytes(), {'Content-Type': 'image/jpeg'}
+
+
+def client(url, payloads, first, count, latencies, statuses, lock):
+    """Send count requests over one keep-alive connection, cycling through payloads from index first"""
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+    for index in range(first, first + count):
+        body, headers = payloads[index % len(payloads)]
+        start = time.perf_counter()
+        try:
+            connection.request('POST', url.path or '/detect', body, headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+            status = 'error'
+        elapsed = time.perf_counter() - start
+
+        with lock:
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                latencies.append(elapsed)
+    connection.close()
+
+
+def cache_counters(url):
+    """
+    Read the result cache counters from the server's /metrics
+
+    Returns:
+        tuple: (hits, misses), or None if /metrics could not be read
+    """
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+    try:
+        connection.request('GET', '/metrics')
+        text = connection.getresponse().read().decode('utf-8')
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        connection.close()
+
+    def counter(name):
+        match = re.search(rf'^\w+_{name}_total (\S+)$', text, re.MULTILINE)
+        return int(float(match.group(1))) if match else 0
+    return counter('cache_hits'), counter('cache_misses')
+
+
+def run(url, payloads, concurrency, total):
+    """
+    Run the load test
+
+    Returns:
+        Dictionary with throughput, latency percentiles, status counts and
+        the result cache hits/misses on the server during the run (None if unknown)
+    """
+    url = urlparse(url)
+    latencies, statuses, lock = [], {}, threading.Lock()
+    per_client = [total // concurrency + (i < total % concurrency) for i in range(concurrency)]
+    firsts = np.cumsum([0] + per_client[:-1])
+
+    threads = [threading.Thread(target=client, args=(url, payloads, int(first), count, latencies, statuses, lock))
+               for first, count in zip(firsts, per_client)]
+    before = cache_counters(url)
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    after = cache_counters(url)
+
+    p50, p95, p99 = np.quantile(latencies, [0.5, 0.95, 0.99]) * 1000 if latencies else (0.0, 0.0, 0.0)
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'statuses': statuses,
+        'cache_hits': after[0] - before[0] if before and after else None,
+        'cache_misses': after[1] - before[1] if before and after else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test a running car color detection server")
+    parser.add_argument('--url', default=f"http://{config.SERVER_HOST}:{config.SERVER_PORT}/detect",
+                        help="Detect endpoint to call")
+    parser.add_argument('-c', '--concurrency', type=int, default=8, help="Parallel clients")
+    parser.add_argument('-n', '--requests', type=int, default=100, help="Total requests to send")
+    parser.add_argument('--image', help="Image to upload (default: synthetic 1280x720 scene)")
+    parser.add_argument('--raw', action='store_true', help="Send raw BGR frames instead of JPEG")
+    parser.add_argument('--frames', type=int, default=None,
+                        help="Different synthetic scenes to cycle through (default: one per request, at most 256)")
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.image, args.raw, args.frames or min(args.requests, 256))
+    report = run(args.url, payloads, args.concurrency, args.requests)
+
+    print(f"{report['requests']} requests, {report['concurrency']} clients, {report['seconds']:.2f}s")
+    print(f"Throughput: {report['throughput']:.1f} req/s (successful)")
+    print(f"Latency: p50 {report['p50_ms']:.1f} ms, p95 {report['p95_ms']:.1f} ms, p99 {report['p99_ms']:.1f} ms")
+    print("Status codes: " + ", ".join(f"{status}: {count}" for status, count in sorted(report['statuses'].items(), key=str)))
+    if report['cache_hits'] is None:
+        print("Result cache: unknown (could not read /metrics)")
+    elif not report['cache_hits'] and not report['cache_misses']:
+        print("Result cache: no lookups, it is off on the server")
+    else:
+        print(f"Result cache: {report['cache_hits']} hits, {report['cache_misses']} misses during the run")
+        if report['cache_hits']:
+            print("Warning: cached answers are included in these timings, "
+                  "start the server with --no-cache (or send different frames) to time inference")
+
+
+if __name__ == "__main__":
+    main()
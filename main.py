@@ -1,10 +1,19 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import cv2
-from PIL import Image, ImageTk
 import numpy as np
 from car_color_detection import CarColorDetector
+from frame_capture import LatestFrameCapture
+from metrics import format_stats, start_metrics_server
+from gui import ImagePane, calculate_statistics, validate_image
+from traffic_stats import TrafficStatistics
+from detection_log import DetectionLog
+from renderer import render_detections
+from motion_gate import MotionGate
+from zones import zones_for
+import config
 import threading
+import time
 
 class TrafficAnalysisApp:
     def __init__(self, root):
@@ -12,11 +21,57 @@ class TrafficAnalysisApp:
         self.root.title("Car Color Detection & Traffic Analysis")
         self.root.geometry("1200x800")
         
+        # The model is loaded in the background so the window appears straight away
         self.detector = CarColorDetector()
         self.current_image = None
+        self.current_source = None
         self.processed_image = None
         
+        self.metrics = self.detector.metrics
+        
+        # Rolling counts over config.TRAFFIC_STATS_WINDOWS, fed by every processed frame
+        self.traffic_stats = TrafficStatistics()
+        self.traffic_snapshot = None
+        self.traffic_snapshot_time = 0.0
+        
+        # Counts shown in the results panel, it is only rebuilt when they change
+        self.shown_counts = None
+        
+        # Latest prepared webcam frame waiting for the Tk thread, older ones are replaced
+        self.display_lock = threading.Lock()
+        self.display_slot = None
+        
+        # Webcam frames only run detection when the scene has changed
+        self.motion_gate = MotionGate() if config.MOTION_GATING else None
+        self.last_analysis = None
+        
+        # Every detection is written to SQLite in the background when enabled
+        self.detection_log = DetectionLog() if config.DETECTION_LOG_ENABLED else None
+        
         self.setup_gui()
+        threading.Thread(target=self._warm_up_thread, daemon=True).start()
+        
+        # Optional Prometheus endpoint and the diagnostics panel refresh
+        if config.METRICS_PORT:
+            start_metrics_server(self.metrics, config.METRICS_PORT)
+        self._refresh_diagnostics()
+        
+    def _warm_up_thread(self):
+        try:
+            self.detector.warm_up(
+                progress=lambda message, fraction: self.root.after(0, self._update_status, message, fraction))
+        except Exception as e:
+            self.root.after(0, self._update_status, f"Model loading failed: {e}", 0)
+            
+    def _update_status(self, message, fraction):
+        self.status_label.configure(text=message)
+        self.status_progress['value'] = fraction * 100
+        if fraction >= 1.0:
+            self.status_progress.grid_remove()
+            
+    def _refresh_diagnostics(self):
+        self.diagnostics_label.configure(text=format_stats(self.metrics.stats()))
+        self.root.after(1000, self._refresh_diagnostics)
         
     def setup_gui(self):
         # Main frame
@@ -34,6 +89,12 @@ class TrafficAnalysisApp:
         ttk.Button(control_frame, text="Start Webcam", command=self.start_webcam).grid(row=0, column=3, padx=5)
         ttk.Button(control_frame, text="Stop Webcam", command=self.stop_webcam).grid(row=0, column=4, padx=5)
         
+        # Model loading status
+        self.status_label = ttk.Label(control_frame, text="Starting...")
+        self.status_label.grid(row=0, column=5, padx=(20, 5))
+        self.status_progress = ttk.Progressbar(control_frame, length=150, mode='determinate', maximum=100)
+        self.status_progress.grid(row=0, column=6, padx=5)
+        
         # Image display frames
         image_frame = ttk.Frame(main_frame)
         image_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -52,6 +113,10 @@ class TrafficAnalysisApp:
         self.processed_label = ttk.Label(processed_frame)
         self.processed_label.grid(row=0, column=0)
         
+        # Panes reuse their PhotoImage and keep the aspect ratio
+        self.original_pane = ImagePane(self.original_label)
+        self.processed_pane = ImagePane(self.processed_label)
+        
         # Results panel
         results_frame = ttk.LabelFrame(main_frame, text="Analysis Results", padding="10")
         results_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
@@ -62,6 +127,13 @@ class TrafficAnalysisApp:
         self.results_text.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
         
+        # Diagnostics panel: stage latency percentiles and counters
+        diagnostics_frame = ttk.LabelFrame(main_frame, text="Diagnostics", padding="10")
+        diagnostics_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        self.diagnostics_label = ttk.Label(diagnostics_frame, font=("Courier", 9), justify=tk.LEFT)
+        self.diagnostics_label.grid(row=0, column=0, sticky=tk.W)
+        
         # Configure grid weights
         self.root.grid_rowconfigure(0, weight=1)
         self.root.grid_columnconfigure(0, weight=1)
@@ -78,21 +150,19 @@ class TrafficAnalysisApp:
         )
         
         if file_path:
-            self.current_image = cv2.imread(file_path)
+            image = cv2.imread(file_path)
+            is_valid, message = validate_image(image)
+            if not is_valid:
+                messagebox.showwarning("Warning", message)
+                return
+                
+            self.current_image = image
+            self.current_source = file_path
             self.display_original_image()
             
     def display_original_image(self):
         if self.current_image is not None:
-            # Resize for display
-            display_image = cv2.resize(self.current_image, (400, 300))
-            display_image = cv2.cvtColor(display_image, cv2.COLOR_BGR2RGB)
-            
-            # Convert to PhotoImage
-            pil_image = Image.fromarray(display_image)
-            photo = ImageTk.PhotoImage(pil_image)
-            
-            self.original_label.configure(image=photo)
-            self.original_label.image = photo
+            self.original_pane.show_image(self.current_image)
             
     def process_image(self):
         if self.current_image is None:
@@ -105,7 +175,7 @@ class TrafficAnalysisApp:
     def _process_image_thread(self):
         try:
             # Process the image
-            result_image, results = self.detector.process_image(self.current_image.copy())
+            result_image, results = self.analyze_and_draw(self.current_image.copy(), self.current_source)
             self.processed_image = result_image
             
             # Update GUI in main thread
@@ -114,21 +184,45 @@ class TrafficAnalysisApp:
         except Exception as e:
             self.root.after(0, lambda: messagebox.showerror("Error", f"Processing failed: {str(e)}"))
             
-    def _update_processed_image(self, result_image, results):
-        # Display processed image
-        display_image = cv2.resize(result_image, (400, 300))
-        display_image = cv2.cvtColor(display_image, cv2.COLOR_BGR2RGB)
+    def analyze_and_draw(self, image, source, session=None):
+        """Process an image like CarColorDetector.process_image, logging and counting its detections"""
+        detections, results = self.detector.analyze_image(image)
+        with self.metrics.timer('draw'):
+            render_detections(image, detections, results, zones=self.detector.zones)
+            
+        self.last_analysis = (detections, results)
+        self.traffic_stats.add(results)
+        if self.detection_log is not None:
+            self.detection_log.record(detections, source or 'image', session=session)
+        return image, results
         
-        pil_image = Image.fromarray(display_image)
-        photo = ImageTk.PhotoImage(pil_image)
+    def reuse_last_analysis(self, image):
+        """Draw the previous detections onto an unchanged frame instead of analysing it"""
+        detections, results = self.last_analysis
+        with self.metrics.timer('draw'):
+            render_detections(image, detections, results, zones=self.detector.zones)
+            
+        self.traffic_stats.add(results)
+        return image, results
         
-        self.processed_label.configure(image=photo)
-        self.processed_label.image = photo
+    def _update_processed_image(self, result_image, results):
+        with self.metrics.timer('display'):
+            self._draw_processed_image(result_image, results)
+            
+    def _draw_processed_image(self, result_image, results):
+        self.processed_pane.show_image(result_image)
+        self.update_results(results, force=True)
         
-        # Update results
-        self.update_results(results)
+    def update_results(self, results, webcam_stats=None, force=False):
+        # Skip the rebuild while the counts and the rolling statistics snapshot are unchanged
+        counts = (results['total_cars'], results['blue_cars'], results['other_cars'], results['total_people'],
+                  tuple(sorted(results['car_colors'].items())), results.get('unique_cars'),
+                  tuple(sorted(results.get('unique_car_colors', {}).items())), repr(results.get('zones')))
+        snapshot_refreshed = self._refresh_traffic_snapshot()
+        if not force and not snapshot_refreshed and counts == self.shown_counts:
+            return
+        self.shown_counts = counts
         
-    def update_results(self, results):
         self.results_text.delete(1.0, tk.END)
         
         result_text = f"""TRAFFIC ANALYSIS RESULTS
@@ -154,8 +248,61 @@ DETECTION CONFIDENCE:
 - Average Person Detection Confidence: {results.get('avg_person_confidence', 0):.2f}
 """
         
+        if 'unique_car_colors' in results:
+            result_text += f"""
+SESSION (UNIQUE VEHICLES):
+- Unique Cars: {results['unique_cars']}
+"""
+            for color, count in results['unique_car_colors'].items():
+                result_text += f"- {color.title()}: {count}\n"
+                
+        if 'zones' in results:
+            result_text += "\nZONES:\n"
+            for name, counts in results['zones'].items():
+                colors = ", ".join(f"{color.title()} {count}" for color, count in counts['car_colors'].items())
+                result_text += (f"- {name}: {counts['cars']} cars ({counts['blue_cars']} blue), "
+                                f"{counts['people']} people" + (f" [{colors}]" if colors else "") + "\n")
+                
+        if webcam_stats:
+            result_text += f"""
+WEBCAM:
+- Frames Captured: {webcam_stats['frames_captured']}
+- Frames Dropped: {webcam_stats['frames_dropped'] + webcam_stats['display_skipped']}
+- Capture to Display Latency: {webcam_stats['display_latency_ms']:.0f} ms
+"""
+            if 'motion' in webcam_stats:
+                motion = webcam_stats['motion']
+                result_text += (f"- Static Frames Reused: {motion['reused']} of {motion['frames']} "
+                                f"({motion['skip_rate']:.0%}), {motion['forced']} forced re-detections\n")
+            
+        result_text += self._format_traffic_statistics()
+        
         self.results_text.insert(tk.END, result_text)
         
+    def _refresh_traffic_snapshot(self):
+        """Take a new rolling statistics snapshot every TRAFFIC_STATS_INTERVAL seconds, True if one was taken"""
+        now = time.time()
+        if self.traffic_snapshot is None or now - self.traffic_snapshot_time >= config.TRAFFIC_STATS_INTERVAL:
+            self.traffic_snapshot = self.traffic_stats.snapshot(now)
+            self.traffic_snapshot_time = now
+            return True
+        return False
+        
+    def _format_traffic_statistics(self):
+        """Text for the rolling statistics in the latest snapshot"""
+        text = "\nROLLING STATISTICS:\n"
+        for name, totals in self.traffic_snapshot.items():
+            stats = calculate_statistics(totals)
+            text += (f"- Last {name}: {stats['frames']} frames, {stats['cars_per_frame']:.1f} cars/frame, "
+                     f"{stats['people_per_frame']:.1f} people/frame, "
+                     f"car confidence {stats['avg_car_confidence']:.2f}\n")
+            if stats['color_share']:
+                text += "  " + ", ".join(f"{color.title()} {share:.0%}"
+                                         for color, share in stats['color_share'].items()) + "\n"
+            if stats['new_cars']:
+                text += f"  New vehicles: {stats['new_cars']}\n"
+        return text
+        
     def save_result(self):
         if self.processed_image is None:
             messagebox.showwarning("Warning", "No processed image to save!")
@@ -179,48 +326,118 @@ DETECTION CONFIDENCE:
         self.webcam_active = False
         
     def _webcam_thread(self):
-        cap = cv2.VideoCapture(0)
+        capture = LatestFrameCapture(config.WEBCAM_INDEX, config.WEBCAM_FPS)
+        try:
+            capture.start()
+        except IOError as e:
+            self.webcam_active = False
+            self.root.after(0, lambda: messagebox.showerror("Error", str(e)))
+            return
+            
+        self.capture = capture
+        if config.ENABLE_TRACKING:
+            self.detector.start_tracking()
+        if self.motion_gate is not None:
+            self.motion_gate.reset()
+        self.display_pending = False
+        self.display_skipped = 0
+        webcam_source = f"webcam {config.WEBCAM_INDEX}"
+        webcam_session = time.strftime('%Y%m%dT%H%M%S')
+        self.detector.zones = zones_for(webcam_source)
+        self.display_latency_ms = 0.0
+        min_display_interval = 1.0 / config.DISPLAY_FPS
+        last_display = 0.0
+        last_dropped = 0
         
         while self.webcam_active:
-            ret, frame = cap.read()
-            if ret:
-                self.current_image = frame.copy()
+            # Always take the freshest frame, older ones are dropped by the capture thread
+            with self.metrics.timer('capture_wait'):
+                item = capture.read(timeout=1.0)
+            if item is None:
+                continue
+            frame, captured_at = item
+            
+            dropped = capture.frames_dropped
+            if dropped > last_dropped:
+                self.metrics.increment('dropped_frames', dropped - last_dropped)
+                last_dropped = dropped
+            self.current_image = frame.copy()
+            
+            # Process frame
+            try:
+                if self.motion_gate is None or self.motion_gate.should_detect(frame):
+                    result_image, results = self.analyze_and_draw(frame, webcam_source, webcam_session)
+                else:
+                    self.metrics.increment('motion_reused')
+                    result_image, results = self.reuse_last_analysis(frame)
+                self.processed_image = result_image
+                
+                # Redraw at most DISPLAY_FPS times per second
+                now = time.perf_counter()
+                if now - last_display < min_display_interval:
+                    self.display_skipped += 1
+                    self.metrics.increment('dropped_frames')
+                    continue
+                last_display = now
+                
+                # Resize and convert here, so the Tk thread only copies pixels
+                display = (self.original_pane.prepare(self.current_image),
+                           self.processed_pane.prepare(result_image), results, captured_at)
+                
+                # Replace any frame the Tk thread has not drawn yet, and post one update at a time
+                with self.display_lock:
+                    if self.display_slot is not None:
+                        self.display_skipped += 1
+                        self.metrics.increment('dropped_frames')
+                    self.display_slot = display
+                    schedule = not self.display_pending
+                    self.display_pending = True
+                if schedule:
+                    self.root.after(0, self._update_webcam_display)
+                
+            except Exception as e:
+                print(f"Processing error: {e}")
                 
-                # Process frame
-                try:
-                    result_image, results = self.detector.process_image(frame)
-                    self.processed_image = result_image
-                    
-                    # Update GUI
-                    self.root.after(0, self._update_webcam_display, frame, result_image, results)
-                    
-                except Exception as e:
-                    print(f"Processing error: {e}")
-                    
-        cap.release()
-        
-    def _update_webcam_display(self, original, processed, results):
-        # Update original image
-        display_original = cv2.resize(original, (400, 300))
-        display_original = cv2.cvtColor(display_original, cv2.COLOR_BGR2RGB)
-        pil_original = Image.fromarray(display_original)
-        photo_original = ImageTk.PhotoImage(pil_original)
-        self.original_label.configure(image=photo_original)
-        self.original_label.image = photo_original
-        
-        # Update processed image
-        display_processed = cv2.resize(processed, (400, 300))
-        display_processed = cv2.cvtColor(display_processed, cv2.COLOR_BGR2RGB)
-        pil_processed = Image.fromarray(display_processed)
-        photo_processed = ImageTk.PhotoImage(pil_processed)
-        self.processed_label.configure(image=photo_processed)
-        self.processed_label.image = photo_processed
-        
-        # Update results
-        self.update_results(results)
+        capture.stop()
+        self.detector.stop_tracking()
+        self.detector.zones = None
+        
+    def webcam_stats(self):
+        """Return dropped-frame and capture-to-display latency counters for the webcam"""
+        stats = self.capture.stats()
+        stats['display_skipped'] = self.display_skipped
+        stats['display_latency_ms'] = self.display_latency_ms
+        if self.motion_gate is not None:
+            stats['motion'] = self.motion_gate.stats()
+        return stats
+        
+    def _update_webcam_display(self):
+        # Draw only the latest frame, whatever was posted before it
+        with self.display_lock:
+            display = self.display_slot
+            self.display_slot = None
+            self.display_pending = False
+        if display is None:
+            return
+            
+        original, processed, results, captured_at = display
+        with self.metrics.timer('display'):
+            self._draw_webcam_display(original, processed, results, captured_at)
+        self.metrics.observe('capture_to_display', time.perf_counter() - captured_at)
+        
+    def _draw_webcam_display(self, original, processed, results, captured_at):
+        self.original_pane.show(original)
+        self.processed_pane.show(processed)
+        
+        self.display_latency_ms = (time.perf_counter() - captured_at) * 1000
+        self.update_results(results, self.webcam_stats())
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = TrafficAnalysisApp(root)
     root.mainloop()
+    
+    # Write the detections still queued for the log
+    if app.detection_log is not None:
+        app.detection_log.close()
 
@@ -0,0 +1,152 @@
+"""
+Stage Timing and Metrics for Car Color Detection System
+Low-overhead stage timers and counters with rolling latency percentiles,
+readable as a stats dict, as Prometheus text, or from a local HTTP endpoint
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import config
+
+
+class RollingHistogram:
+    """Latency samples in a fixed-size ring buffer, so memory stays flat"""
+
+    def __init__(self, size):
+        self._samples = np.zeros(size, dtype=np.float64)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        self._samples[self.count % len(self._samples)] = seconds
+        self.count += 1
+        self.total += seconds
+
+    def percentiles(self, quantiles):
+        """Return the requested quantiles (0..1) of the samples in the window"""
+        if self.count == 0:
+            return [0.0] * len(quantiles)
+        window = self._samples[:min(self.count, len(self._samples))]
+        return list(np.quantile(window, quantiles))
+
+
+class Metrics:
+    """Stage timers and counters shared by the detector and the GUI"""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, window=None):
+        self.window = window or config.METRICS_WINDOW
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        """Record one duration for a stage"""
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = RollingHistogram(self.window)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """Time the body of a with block as one sample of a stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def increment(self, name, value=1):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def stats(self):
+        """
+        Return counters and per-stage latency percentiles
+
+        Returns:
+            Dictionary with 'counters' and 'stages', where each stage has
+            count, mean_ms, p50_ms, p95_ms and p99_ms
+        """
+        with self._lock:
+            stages = {}
+            for stage, histogram in self._stages.items():
+                p50, p95, p99 = histogram.percentiles(self.QUANTILES)
+                stages[stage] = {
+                    'count': histogram.count,
+                    'mean_ms': histogram.total / histogram.count * 1000 if histogram.count else 0.0,
+                    'p50_ms': p50 * 1000,
+                    'p95_ms': p95 * 1000,
+                    'p99_ms': p99 * 1000
+                }
+            return {'counters': dict(self._counters), 'stages': stages}
+
+    def to_prometheus(self, prefix='car_color'):
+        """Return the metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = []
+            for name, value in sorted(self._counters.items()):
+                metric = f"{prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+
+            metric = f"{prefix}_stage_latency_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for stage, histogram in sorted(self._stages.items()):
+                for quantile, value in zip(self.QUANTILES, histogram.percentiles(self.QUANTILES)):
+                    lines.append(f'{metric}{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+
+            return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(metrics, port=None, host='127.0.0.1'):
+    """
+    Serve metrics.to_prometheus() at http://host:port/metrics on a background thread
+
+    Returns:
+        The running ThreadingHTTPServer (call shutdown() to stop it)
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port or config.METRICS_PORT), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def format_stats(stats):
+    """Format a Metrics.stats() dict as a fixed-width text table for the GUI"""
+    lines = [f"{'stage':<14}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+    for stage, values in stats['stages'].items():
+        lines.append(f"{stage:<14}{values['count']:>8}{values['p50_ms']:>10.1f}"
+                     f"{values['p95_ms']:>10.1f}{values['p99_ms']:>10.1f}")
+    counters = ", ".join(f"{name}: {value}" for name, value in sorted(stats['counters'].items()))
+    lines.append(counters or "No frames processed yet")
+    return "\n".join(lines)
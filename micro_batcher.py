@@ -0,0 +1,166 @@
+"""
+Dynamic Micro-Batching for Car Color Detection System
+Frames submitted from many threads are queued and run through one shared
+CarColorDetector in batches, closed when the batch is full or when the
+oldest frame has waited the maximum delay, whichever comes first
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+import config
+from metrics import RollingHistogram
+from renderer import render_detections
+
+
+class MicroBatcher:
+    """Collect frames from concurrent callers into batched detector calls
+
+    Tracking is per detector, so frames from different cameras should not
+    share a batcher whose detector has tracking enabled.
+    """
+
+    def __init__(self, detector, max_batch_size=None, max_wait_ms=None):
+        self.detector = detector
+        self.max_batch_size = max_batch_size or config.MICRO_BATCH_SIZE
+        self.max_wait = (config.MICRO_BATCH_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._running = False
+        self._lock = threading.Lock()
+
+        # Batch sizes and queue waits, for stats()
+        self._batch_sizes = np.zeros(self.max_batch_size + 1, dtype=np.int64)
+        self._waits = RollingHistogram(config.METRICS_WINDOW)
+
+    def start(self):
+        """Start the batching thread"""
+        if self._running:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Finish the frames already queued and stop the batching thread"""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, frame, draw=False):
+        """
+        Queue a frame for the next batch
+
+        Args:
+            frame: OpenCV image (BGR)
+            draw: Draw the detections onto the frame, like process_image
+
+        Returns:
+            Future resolving to (detections, analysis_results), or to
+            (frame, analysis_results) when draw is set
+        """
+        if not self._running:
+            raise RuntimeError("MicroBatcher is not running, call start() first")
+        future = Future()
+        self._queue.put((frame, draw, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # The oldest frame sets the deadline for the whole batch
+            batch = [item]
+            deadline = item[3] + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._run_batch(batch)
+            if stopping:
+                self._drain()
+                return
+
+    def _drain(self):
+        """Run whatever is still queued after stop() in full-size batches"""
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                batch.append(item)
+            if len(batch) == self.max_batch_size:
+                self._run_batch(batch)
+                batch = []
+        if batch:
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        with self._lock:
+            self._batch_sizes[len(batch)] += 1
+            for _, _, _, submitted in batch:
+                self._waits.observe(started - submitted)
+
+        frames = [frame for frame, _, _, _ in batch]
+        try:
+            analyses = self.detector.analyze_batch(frames, batch_size=len(frames))
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (frame, draw, future, _), (detections, analysis_results) in zip(batch, analyses):
+            if draw:
+                with self.detector.metrics.timer('draw'):
+                    render_detections(frame, detections, analysis_results, zones=self.detector.zones)
+                future.set_result((frame, analysis_results))
+            else:
+                future.set_result((detections, analysis_results))
+
+    def stats(self):
+        """
+        Return batch fill and queue wait statistics
+
+        Returns:
+            Dictionary with batches, frames, mean_batch_size, fill_ratio,
+            batch_sizes ({size: count}) and wait p50/p95/p99 in milliseconds
+        """
+        with self._lock:
+            sizes = np.arange(len(self._batch_sizes))
+            batches = int(self._batch_sizes.sum())
+            frames = int((self._batch_sizes * sizes).sum())
+            p50, p95, p99 = self._waits.percentiles((0.5, 0.95, 0.99))
+            return {
+                'batches': batches,
+                'frames': frames,
+                'mean_batch_size': frames / batches if batches else 0.0,
+                'fill_ratio': frames / (batches * self.max_batch_size) if batches else 0.0,
+                'batch_sizes': {int(size): int(count) for size, count in zip(sizes, self._batch_sizes) if count},
+                'wait_p50_ms': float(p50) * 1000,
+                'wait_p95_ms': float(p95) * 1000,
+                'wait_p99_ms': float(p99) * 1000
+            }
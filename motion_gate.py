@@ -0,0 +1,92 @@
+"""
+Motion Gate for Car Color Detection System
+Compares a small blurred grayscale copy of each frame with the last frame
+that was analysed, so detection only runs when enough of the scene has
+changed or when the previous result has become too old
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+import config
+
+
+class MotionGate:
+    """Decide per frame whether detection has to run again"""
+
+    def __init__(self, threshold=None, pixel_threshold=None, max_interval=None, thumbnail_width=None):
+        self.threshold = config.MOTION_THRESHOLD if threshold is None else threshold
+        self.pixel_threshold = pixel_threshold or config.MOTION_PIXEL_THRESHOLD
+        self.max_interval = config.MOTION_MAX_INTERVAL if max_interval is None else max_interval
+        self.thumbnail_width = thumbnail_width or config.MOTION_THUMBNAIL_WIDTH
+        self.reset()
+
+    def reset(self):
+        """Forget the reference frame, so the next frame is always analysed"""
+        self._reference = None
+        self._reference_time = 0.0
+        self.motion = 0.0
+        self.frames = 0
+        self.detected = 0
+        self.reused = 0
+        self.forced = 0
+
+    def thumbnail(self, frame):
+        """Downscaled, blurred grayscale copy of a frame used for differencing"""
+        height, width = frame.shape[:2]
+        size = (self.thumbnail_width, max(1, round(height * self.thumbnail_width / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+    def should_detect(self, frame, now=None):
+        """
+        Check a frame against the last analysed one
+
+        Args:
+            frame: OpenCV image (BGR)
+            now: Time of the frame in seconds (None for time.perf_counter())
+
+        Returns:
+            True if detection has to run, in which case the frame becomes the
+            new reference; False if the previous result can be reused
+        """
+        now = time.perf_counter() if now is None else now
+        thumbnail = self.thumbnail(frame)
+        self.frames += 1
+
+        if self._reference is None or self._reference.shape != thumbnail.shape:
+            self.motion = 1.0
+        else:
+            changed = cv2.absdiff(thumbnail, self._reference) > self.pixel_threshold
+            self.motion = float(np.count_nonzero(changed)) / changed.size
+
+        stale = now - self._reference_time >= self.max_interval
+        if self.motion < self.threshold and not stale:
+            self.reused += 1
+            return False
+
+        if self.motion < self.threshold:
+            self.forced += 1
+        self.detected += 1
+        self._reference = thumbnail
+        self._reference_time = now
+        return True
+
+    def stats(self):
+        """
+        Return detect/reuse counts
+
+        Returns:
+            Dictionary with frames, detected, reused, forced (static scene
+            re-detected after max_interval), skip_rate and the last motion
+        """
+        return {
+            'frames': self.frames,
+            'detected': self.detected,
+            'reused': self.reused,
+            'forced': self.forced,
+            'skip_rate': self.reused / self.frames if self.frames else 0.0,
+            'motion': self.motion
+        }
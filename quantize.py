@@ -0,0 +1,351 @@
+"""
+Quantised CPU Inference for Car Color Detection System
+Makes INT8 and FP16 versions of the ONNX model for the onnxruntime backend
+and compares them with the FP32 model on the same images, through the same
+CarColorDetector, for latency, memory and detection/color agreement.
+INT8 ranges are calibrated on a folder of your own junction images.
+bfloat16 runs through PyTorch instead (TORCH_PRECISION = 'bf16')
+
+Usage:
+    python quantize.py int8 calibration_images/ -o yolov8n-int8.onnx
+    python quantize.py fp16 -o yolov8n-fp16.onnx
+    python quantize.py compare test_images/ yolov8n-int8.onnx yolov8n-fp16.onnx -o report.json
+    python quantize.py compare test_images/ --torch bf16
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import config
+from backends import OnnxRuntimeBackend, cpu_half_precision
+from batch_process import find_images, serialize_detections
+
+CALIBRATION_METHODS = ('minmax', 'entropy', 'percentile')
+
+
+def sample_paths(paths, count):
+    """Pick up to count paths spread evenly over a sorted list, e.g. over the times of day"""
+    if len(paths) <= count:
+        return list(paths)
+    return [paths[int(index)] for index in np.linspace(0, len(paths) - 1, count)]
+
+
+def head_decode_nodes(model):
+    """
+    Names of the box decoding nodes of an ultralytics export (everything in
+    the last /model.N/ module except its convolutions)
+
+    Returns:
+        List of node names, empty for models exported some other way
+    """
+    pattern = re.compile(r'^/model\.(\d+)/')
+    indexes = [int(match.group(1)) for match in (pattern.match(node.name) for node in model.graph.node) if match]
+    if not indexes:
+        return []
+    prefix = f'/model.{max(indexes)}/'
+    return [node.name for node in model.graph.node if node.name.startswith(prefix) and node.op_type != 'Conv']
+
+
+def calibration_reader(image_paths, model_path):
+    """Feed calibration images to ONNX Runtime with the backend's own preprocessing"""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    backend = OnnxRuntimeBackend(model_path)
+    backend.load()
+
+    class ImageFolderReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(path)
+                if image is not None:
+                    blob, _ = backend.preprocess([image])
+                    return {backend.input_name: blob}
+            return None
+
+    return ImageFolderReader()
+
+
+def quantize_int8(image_folder, output_path, model_path=None, max_images=None, method='minmax',
+                  exclude_head=None):
+    """
+    Post-training static INT8 quantisation of the ONNX model
+
+    Weights are quantised per channel and activations per tensor, with
+    ranges calibrated on images from image_folder.
+
+    Args:
+        image_folder: Directory or glob of calibration images from your own cameras
+        output_path: Where to write the INT8 model
+        model_path: FP32 ONNX model (None for config.ONNX_MODEL)
+        max_images: Most calibration images (None for config.QUANT_CALIBRATION_IMAGES)
+        method: Range calibration, one of CALIBRATION_METHODS
+        exclude_head: Keep the box decoding in float (None for config.QUANT_EXCLUDE_HEAD)
+
+    Returns:
+        tuple: (calibration images used, nodes kept in float)
+    """
+    try:
+        import onnx
+        from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+    except ImportError:
+        raise ImportError("INT8 quantisation needs the onnxruntime and onnx packages: pip install onnxruntime onnx")
+
+    model_path = model_path or config.ONNX_MODEL
+    exclude_head = config.QUANT_EXCLUDE_HEAD if exclude_head is None else exclude_head
+    _, paths = find_images(image_folder)
+    paths = sample_paths(paths, max_images or config.QUANT_CALIBRATION_IMAGES)
+    if not paths:
+        raise ValueError(f"No calibration images found in {image_folder}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Shape inference and graph cleanup first, as ONNX Runtime recommends
+        prepared = os.path.join(directory, 'prepared.onnx')
+        quant_pre_process(model_path, prepared)
+        excluded = head_decode_nodes(onnx.load(prepared)) if exclude_head else []
+
+        quantize_static(prepared, output_path, calibration_reader(paths, prepared),
+                        quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        calibrate_method={'minmax': CalibrationMethod.MinMax,
+                                          'entropy': CalibrationMethod.Entropy,
+                                          'percentile': CalibrationMethod.Percentile}[method],
+                        nodes_to_exclude=excluded)
+    return len(paths), len(excluded)
+
+
+def convert_fp16(output_path, model_path=None):
+    """
+    Convert the ONNX model's weights and arithmetic to FP16, keeping float32 input and output
+
+    Only worth it on CPUs with native fp16 (see backends.cpu_half_precision);
+    elsewhere ONNX Runtime converts back and forth and runs slower than FP32.
+    """
+    try:
+        import onnx
+        from onnxconverter_common import float16
+    except ImportError:
+        raise ImportError("FP16 conversion needs the onnx and onnxconverter-common packages: "
+                          "pip install onnx onnxconverter-common")
+
+    model = onnx.load(model_path or config.ONNX_MODEL)
+    onnx.save(float16.convert_float_to_float16(model, keep_io_types=True), output_path)
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process in MB, or None where it cannot be read"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_variant(backend_name, backend_kwargs, image_paths):
+    """Analyse every image with one model, in a fresh process so its memory is measured alone"""
+    from backends import create_backend
+    from car_color_detection import CarColorDetector
+
+    start_memory = peak_memory_mb()
+    detector = CarColorDetector(create_backend(backend_name, **backend_kwargs))
+    detector.result_cache = None
+    start = time.perf_counter()
+    detector.warm_up()
+    load_seconds = time.perf_counter() - start
+
+    times, detections = [], []
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is None:
+            detections.append([])
+            continue
+        start = time.perf_counter()
+        found, _ = detector.analyze_image(image)
+        times.append(time.perf_counter() - start)
+        detections.append(serialize_detections(found))
+
+    peak = peak_memory_mb()
+    return {
+        'load_s': load_seconds,
+        'ms_per_image': float(np.mean(times)) * 1000 if times else 0.0,
+        'p95_ms': float(np.percentile(times, 95)) * 1000 if times else 0.0,
+        'memory_mb': peak - start_memory if peak is not None else None,
+        'detections': detections
+    }
+
+
+def match_detections(baseline, variant, iou_threshold=0.5):
+    """
+    Pair the detections of one image by class and IoU, best overlaps first
+
+    Returns:
+        List of (baseline detection, variant detection)
+    """
+    from tracker import box_iou
+
+    if not baseline or not variant:
+        return []
+    iou = box_iou([d['box'] for d in baseline], [d['box'] for d in variant])
+    iou[np.array([d['class_name'] for d in baseline])[:, None]
+        != np.array([d['class_name'] for d in variant])[None, :]] = 0
+
+    pairs = []
+    while iou.size and iou.max() >= iou_threshold:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        pairs.append((baseline[i], variant[j]))
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return pairs
+
+
+def agreement(baseline, variant):
+    """
+    Compare a variant's detections with the baseline's, image by image
+
+    Returns:
+        Dictionary with detection_f1 (boxes matched by class and IoU >= 0.5),
+        color_agreement (matched cars given the same color) and
+        same_car_count (images with the same number of cars)
+    """
+    matched = total = 0
+    same_color = colored = same_count = 0
+    for base, other in zip(baseline, variant):
+        pairs = match_detections(base, other)
+        matched += len(pairs)
+        total += len(base) + len(other)
+        for a, b in pairs:
+            if a['class_name'] != 'person':
+                colored += 1
+                same_color += a['color_name'] == b['color_name']
+        same_count += (sum(d['class_name'] != 'person' for d in base) ==
+                       sum(d['class_name'] != 'person' for d in other))
+    return {
+        'detection_f1': 2 * matched / total if total else 1.0,
+        'color_agreement': same_color / colored if colored else 1.0,
+        'same_car_count': same_count / len(baseline) if baseline else 1.0
+    }
+
+
+def compare(image_folder, variants, max_images=50):
+    """
+    Run each model variant on the same images and compare it with the first one
+
+    Args:
+        image_folder: Directory or glob of test images
+        variants: List of (label, backend name, backend kwargs), baseline first
+        max_images: Most test images
+
+    Returns:
+        List of report dicts, one per variant
+    """
+    _, paths = find_images(image_folder)
+    paths = sample_paths(paths, max_images)
+    if not paths:
+        raise ValueError(f"No images found in {image_folder}")
+
+    reports = []
+    context = multiprocessing.get_context('spawn')
+    for label, backend_name, backend_kwargs in variants:
+        with context.Pool(1) as pool:
+            result = pool.apply(_run_variant, (backend_name, backend_kwargs, paths))
+        model_path = backend_kwargs.get('model_path')
+        result.update({
+            'variant': label,
+            'model_mb': os.path.getsize(model_path) / 1e6 if model_path and os.path.exists(model_path) else None,
+            'detections_total': sum(len(found) for found in result['detections'])
+        })
+        result.update(agreement(reports[0]['detections'] if reports else result['detections'],
+                                result['detections']))
+        reports.append(result)
+    return reports
+
+
+def print_report(reports, n_images):
+    def mb(value):
+        return f"{value:.1f}" if value is not None else "n/a"
+
+    baseline = reports[0]
+    print(f"{n_images} images, agreement against {baseline['variant']}; CPU native half precision: "
+          f"{', '.join(name for name, native in cpu_half_precision().items() if native) or 'none'}")
+    print(f"{'variant':<24}{'model MB':>9}{'memory MB':>11}{'ms/image':>10}{'p95 ms':>8}{'speedup':>9}"
+          f"{'boxes':>7}{'box F1':>8}{'colors':>8}{'counts':>8}")
+    for report in reports:
+        speedup = baseline['ms_per_image'] / report['ms_per_image'] if report['ms_per_image'] else 0.0
+        print(f"{report['variant']:<24}{mb(report['model_mb']):>9}{mb(report['memory_mb']):>11}"
+              f"{report['ms_per_image']:>10.1f}{report['p95_ms']:>8.1f}{speedup:>8.2f}x"
+              f"{report['detections_total']:>7}{report['detection_f1']:>8.1%}{report['color_agreement']:>8.1%}"
+              f"{report['same_car_count']:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantise the detection model and compare it with FP32")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    int8 = commands.add_parser('int8', help="Post-training INT8 quantisation calibrated on your images")
+    int8.add_argument('images', help="Directory or glob of calibration images")
+    int8.add_argument('-o', '--output', required=True, help="INT8 ONNX model to write")
+    int8.add_argument('-m', '--model', default=config.ONNX_MODEL, help="FP32 ONNX model")
+    int8.add_argument('-n', '--max-images', type=int, default=config.QUANT_CALIBRATION_IMAGES,
+                      help="Most calibration images")
+    int8.add_argument('--method', choices=CALIBRATION_METHODS, default='minmax', help="Range calibration")
+    head = int8.add_mutually_exclusive_group()
+    head.add_argument('--quantize-head', dest='exclude_head', action='store_false',
+                      help="Also quantise the box decoding")
+    head.add_argument('--exclude-head', dest='exclude_head', action='store_true',
+                      help="Keep the box decoding in float")
+    int8.set_defaults(exclude_head=config.QUANT_EXCLUDE_HEAD)
+
+    fp16 = commands.add_parser('fp16', help="Convert the model to FP16")
+    fp16.add_argument('-o', '--output', required=True, help="FP16 ONNX model to write")
+    fp16.add_argument('-m', '--model', default=config.ONNX_MODEL, help="FP32 ONNX model")
+
+    report = commands.add_parser('compare', help="Compare model variants with the FP32 baseline")
+    report.add_argument('images', help="Directory or glob of test images")
+    report.add_argument('models', nargs='*', help="Quantised ONNX models to compare")
+    report.add_argument('-b', '--baseline', default=config.ONNX_MODEL, help="FP32 ONNX model")
+    report.add_argument('--torch', nargs='+', choices=['bf16', 'fp16'], default=None,
+                        help="Compare PyTorch precisions with PyTorch FP32 instead of ONNX models")
+    report.add_argument('-n', '--max-images', type=int, default=50, help="Most test images")
+    report.add_argument('-o', '--output', default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.command == 'int8':
+        used, excluded = quantize_int8(args.images, args.output, args.model, args.max_images, args.method,
+                                       exclude_head=args.exclude_head)
+        print(f"Wrote {args.output}, calibrated on {used} images ({excluded} box decoding nodes kept in float)")
+    elif args.command == 'fp16':
+        convert_fp16(args.output, args.model)
+        if not cpu_half_precision()['fp16']:
+            print("Warning: this CPU has no native fp16, the FP16 model will likely be slower than FP32")
+        print(f"Wrote {args.output}")
+    else:
+        if args.torch:
+            variants = [('torch fp32', 'ultralytics', {'precision': 'fp32'})]
+            variants += [(f"torch {precision}", 'ultralytics', {'precision': precision}) for precision in args.torch]
+        else:
+            variants = [(f"fp32 {os.path.basename(args.baseline)}", 'onnxruntime', {'model_path': args.baseline})]
+            variants += [(os.path.basename(model), 'onnxruntime', {'model_path': model}) for model in args.models]
+
+        reports = compare(args.images, variants, args.max_images)
+        print_report(reports, len(reports[0]['detections']))
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump([{key: value for key, value in report.items() if key != 'detections'}
+                           for report in reports], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Detection Renderer for Car Color Detection System
+Draws the detections returned by CarColorDetector.analyze_image onto an
+image, using the rectangle and text settings from config.py
+"""
+
+import cv2
+
+import config
+
+
+def detection_style(detection):
+    """
+    Return the rectangle color and label for one detection
+
+    Args:
+        detection: Detection dict from CarColorDetector.analyze_image
+
+    Returns:
+        tuple: (BGR color, label text)
+    """
+    if detection['class_name'] == 'person':
+        color, label = config.PERSON_COLOR, "Person"
+    elif detection['color_name'] == 'blue':
+        color, label = config.BLUE_CAR_COLOR, f"Blue {detection['class_name'].title()}"
+    else:
+        color, label = config.OTHER_CAR_COLOR, f"{detection['color_name'].title()} {detection['class_name'].title()}"
+
+    if config.SHOW_CONFIDENCE:
+        label += f" ({detection['confidence']:.2f})"
+    return color, label
+
+
+def render_detections(image, detections, analysis_results=None, copy=False, zones=None):
+    """
+    Draw detection rectangles, labels and an optional summary onto an image
+
+    Args:
+        image: OpenCV image (BGR)
+        detections: List of detection dicts
+        analysis_results: Results dict for the summary text (None to skip it)
+        copy: Draw on a copy instead of the image itself
+        zones: ZoneSet whose outlines and counts are drawn (None to skip them)
+
+    Returns:
+        Annotated image
+    """
+    if copy:
+        image = image.copy()
+
+    if zones is not None:
+        draw_zones(image, zones, analysis_results.get('zones') if analysis_results else None)
+
+    for detection in detections:
+        # Vehicles whose region was empty have no color and are not drawn
+        if detection['class_name'] != 'person' and detection['color_name'] is None:
+            continue
+
+        x1, y1, x2, y2 = detection['box']
+        color, label = detection_style(detection)
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, config.RECTANGLE_THICKNESS)
+        cv2.putText(image, label, (x1, y1 - 10), config.FONT, config.FONT_SCALE, color, config.FONT_THICKNESS)
+
+    if analysis_results is not None:
+        draw_summary(image, analysis_results)
+
+    return image
+
+
+def draw_zones(image, zones, zone_counts=None):
+    """Draw zone outlines with their names and car/people counts"""
+    for zone in zones.zones:
+        polygon = zone.polygon(image.shape)
+        cv2.polylines(image, [polygon], True, config.ZONE_COLOR, 2)
+
+        label = zone.name
+        if zone_counts and zone.name in zone_counts:
+            counts = zone_counts[zone.name]
+            label += f": {counts['cars']} cars ({counts['blue_cars']} blue), {counts['people']} people"
+        x, y = polygon.min(axis=0)
+        cv2.putText(image, label, (int(x) + 5, int(y) + 20), config.FONT, 0.5, config.ZONE_COLOR, 1)
+    return image
+
+
+def draw_summary(image, analysis_results):
+    """Draw the car and people counts in the top-left corner of an image"""
+    summary_y = 30
+    cv2.putText(image, f"Cars: {analysis_results['total_cars']} | Blue Cars: {analysis_results['blue_cars']} | "
+                       f"Other Cars: {analysis_results['other_cars']}",
+                (10, summary_y), config.FONT, 0.7, config.TEXT_COLOR, 2)
+    cv2.putText(image, f"People: {analysis_results['total_people']}",
+                (10, summary_y + 30), config.FONT, 0.7, config.TEXT_COLOR, 2)
+    return image
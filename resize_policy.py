@@ -0,0 +1,47 @@
+"""
+Input Resize Policy for Car Color Detection System
+Oversized inputs are downscaled once to a capped working copy that is used
+for both inference and color sampling; boxes are mapped back to the
+original image coordinates afterwards
+"""
+
+import cv2
+
+import config
+
+
+class ResizePolicy:
+    """Cap the longest side of images before analysis"""
+
+    def __init__(self, max_side=None):
+        self.max_side = config.ANALYSIS_MAX_SIDE if max_side is None else max_side
+
+    def prepare(self, image):
+        """
+        Return the working copy of an image and its scale
+
+        Args:
+            image: OpenCV image (BGR)
+
+        Returns:
+            tuple: (working image, scale of working / original). Images that
+            already fit are returned as they are, without a copy.
+        """
+        height, width = image.shape[:2]
+        longest = max(height, width)
+        if not self.max_side or longest <= self.max_side:
+            return image, 1.0
+
+        scale = self.max_side / longest
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+    @staticmethod
+    def map_box(box, scale, image_shape):
+        """Map a working-copy box back to original coordinates, clipped to the image"""
+        if scale == 1.0:
+            return box
+        height, width = image_shape[:2]
+        x1, y1, x2, y2 = (round(v / scale) for v in box)
+        return (min(max(x1, 0), width), min(max(y1, 0), height),
+                min(max(x2, 0), width), min(max(y2, 0), height))
@@ -0,0 +1,198 @@
+"""
+Result Cache for Car Color Detection System
+Analysis results keyed by a hash of the frame bytes and the detector
+settings, held in an LRU bounded by entry count and bytes with an
+optional on-disk tier bounded by size, so identical frames are only
+analysed once
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import config
+
+# The disk tier is trimmed on the first write and then every this many writes
+DISK_TRIM_EVERY = 64
+
+
+class ResultCache:
+    """LRU cache of (detections, analysis_results) per frame"""
+
+    def __init__(self, max_entries=None, max_mb=None, disk_dir=None, max_disk_mb=None):
+        self.max_entries = max_entries or config.RESULT_CACHE_ENTRIES
+        self.max_bytes = int((max_mb or config.RESULT_CACHE_MB) * 1024 * 1024)
+        self.disk_dir = disk_dir if disk_dir is not None else config.RESULT_CACHE_DIR
+        self.max_disk_bytes = int((max_disk_mb or config.RESULT_CACHE_DISK_MB) * 1024 * 1024)
+        self._disk_writes = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        # key -> pickled result, least recently used first
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(image, fingerprint):
+        """
+        Hash a frame's pixels together with the detector settings
+
+        Args:
+            image: OpenCV image (BGR)
+            fingerprint: Settings string from CarColorDetector.config_fingerprint
+
+        Returns:
+            Hex digest identifying this frame under these settings
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{image.shape}{image.dtype}{fingerprint}".encode('utf-8'))
+        digest.update(memoryview(image if image.flags['C_CONTIGUOUS'] else image.copy()).cast('B'))
+        return digest.hexdigest()
+
+    def validate(self, fingerprint):
+        """Drop the in-memory entries if the detector settings have changed"""
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                if self._fingerprint is not None:
+                    self._entries.clear()
+                    self._bytes = 0
+                    self.invalidations += 1
+                self._fingerprint = fingerprint
+
+    def get(self, key):
+        """Return a fresh copy of the cached result for key, or None"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(data)
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, data)
+        return pickle.loads(data)
+
+    def put(self, key, result):
+        """Cache a result (it is serialised, so later changes to it are not cached)"""
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._store(key, data)
+        self._write_disk(key, data)
+
+    def _store(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[key] = data
+        self._bytes += len(data)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + '.pkl')
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # A hit counts as a use, so trimming removes the least recently used files
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename, so parallel workers never read a partial file
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+
+        with self._lock:
+            trim = self._disk_writes % DISK_TRIM_EVERY == 0
+            self._disk_writes += 1
+        if trim:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        """Remove the least recently used files until the disk tier fits max_disk_bytes"""
+        files = []
+        for folder, _, names in os.walk(self.disk_dir):
+            for name in names:
+                if name.endswith('.pkl'):
+                    path = os.path.join(folder, name)
+                    try:
+                        info = os.stat(path)
+                    except OSError:
+                        # Removed by another worker in the meantime
+                        continue
+                    files.append((info.st_mtime, info.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.disk_evictions += 1
+
+    def clear(self):
+        """Drop the in-memory entries (the disk tier is left as it is)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Return cache statistics
+
+        Returns:
+            Dictionary with entries, bytes, hits, disk_hits, misses, hit_rate,
+            evictions, disk_evictions and invalidations
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'disk_evictions': self.disk_evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,262 @@
+"""
+Local HTTP inference service for Car Color Detection System
+An asyncio server around one shared CarColorDetector. Decoding and
+inference run off the event loop on a bounded executor, and requests
+beyond the queue limit are shed with 503 responses instead of piling up
+
+Usage:
+    python server.py --port 8080
+
+Endpoints:
+    POST /detect   body is a JPEG/PNG file, or a raw BGR frame sent as
+                   application/octet-stream with X-Width and X-Height headers
+    GET  /health   queue and model status
+    GET  /metrics  detector metrics in Prometheus text format
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import config
+from batch_process import serialize_detections, serialize_results
+from micro_batcher import MicroBatcher
+
+REASONS = {
+    200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+    411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error',
+    503: 'Service Unavailable'
+}
+
+
+class HTTPError(Exception):
+    """An error that is sent back to the client with its status code"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def decode_frame(body, headers):
+    """
+    Turn a request body into a BGR image
+
+    Args:
+        body: Request body bytes
+        headers: Lower-case request headers
+
+    Returns:
+        OpenCV image (BGR)
+    """
+    if headers.get('content-type', '').startswith('application/octet-stream'):
+        try:
+            width, height = int(headers['x-width']), int(headers['x-height'])
+        except (KeyError, ValueError):
+            raise HTTPError(400, "Raw frames need integer X-Width and X-Height headers")
+        if len(body) != width * height * 3:
+            raise HTTPError(400, f"Raw frame must be {width}x{height}x3 bytes of BGR data")
+        return np.frombuffer(body, dtype=np.uint8).reshape(height, width, 3).copy()
+
+    image = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise HTTPError(400, "Body is not a decodable JPEG/PNG image")
+    return image
+
+
+class InferenceServer:
+    """asyncio HTTP server with a bounded inference queue"""
+
+    def __init__(self, detector, workers=None, max_queue=None, max_body_mb=None, micro_batch=None):
+        self.detector = detector
+        self.workers = workers or config.SERVER_WORKERS
+        self.max_queue = max_queue or config.SERVER_MAX_QUEUE
+        self.max_body = int((max_body_mb or config.SERVER_MAX_BODY_MB) * 1024 * 1024)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+
+        # Concurrent requests share batched detector calls instead of one call each
+        micro_batch = config.SERVER_MICRO_BATCH if micro_batch is None else micro_batch
+        self.batcher = MicroBatcher(detector) if micro_batch else None
+
+        # Requests waiting for or running inference
+        self.pending = 0
+        self.requests = 0
+        self.shed = 0
+
+    async def serve(self, host=None, port=None):
+        """Warm the detector up and serve until cancelled"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.detector.warm_up)
+        if self.batcher:
+            self.batcher.start()
+
+        server = await asyncio.start_server(self.handle_connection, host or config.SERVER_HOST,
+                                            port or config.SERVER_PORT)
+        address = server.sockets[0].getsockname()
+        print(f"Serving on http://{address[0]}:{address[1]} "
+              f"({self.workers} inference workers, queue limit {self.max_queue}, "
+              f"result cache {'on' if self.detector.result_cache is not None else 'off'})")
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        """Serve keep-alive HTTP/1.1 requests on one connection"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                keep_alive = True
+                try:
+                    method, path, headers = self._parse_head(head)
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                    body = await self._read_body(reader, method, headers)
+                    status, payload, content_type = await self.route(method, path, headers, body)
+                except HTTPError as e:
+                    status, payload, content_type = e.status, {'error': e.message}, 'application/json'
+                    keep_alive = keep_alive and e.status not in (400, 411, 413)
+                except Exception as e:
+                    status, payload, content_type = 500, {'error': str(e)}, 'application/json'
+
+                await self._respond(writer, status, payload, content_type, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def route(self, method, path, headers, body):
+        """Dispatch one request, returning (status, payload, content type)"""
+        path = path.split('?')[0]
+
+        if path == '/health':
+            health = {
+                'status': 'ok',
+                'model_loaded': self.detector.model_loaded,
+                'pending': self.pending,
+                'max_queue': self.max_queue,
+                'requests': self.requests,
+                'shed': self.shed
+            }
+            if self.batcher:
+                health['micro_batch'] = self.batcher.stats()
+            return 200, health, 'application/json'
+
+        if path == '/metrics':
+            return 200, self.detector.metrics.to_prometheus(), 'text/plain; version=0.0.4'
+
+        if path != '/detect':
+            raise HTTPError(404, f"Unknown path: {path}")
+        if method != 'POST':
+            raise HTTPError(405, "Use POST to send an image")
+
+        self.requests += 1
+
+        # Load shedding: refuse work instead of queueing it without bound
+        if self.pending >= self.max_queue:
+            self.shed += 1
+            self.detector.metrics.increment('shed_requests')
+            raise HTTPError(503, "Server busy, retry later")
+
+        self.pending += 1
+        try:
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            # Decoding a large JPEG would stall every other connection on the loop
+            image = await loop.run_in_executor(self.executor, decode_frame, body, headers)
+            if self.batcher:
+                detections, results = await asyncio.wrap_future(self.batcher.submit(image))
+            else:
+                detections, results = await loop.run_in_executor(self.executor, self.detector.analyze_image, image)
+        finally:
+            self.pending -= 1
+
+        height, width = image.shape[:2]
+        return 200, {
+            'width': width,
+            'height': height,
+            'latency_ms': round((time.perf_counter() - started) * 1000, 2),
+            'results': serialize_results(results),
+            'detections': serialize_detections(detections)
+        }, 'application/json'
+
+    def _parse_head(self, head):
+        try:
+            lines = head.decode('latin-1').split('\r\n')
+            method, path, _ = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        return method.upper(), path, headers
+
+    async def _read_body(self, reader, method, headers):
+        if method != 'POST':
+            return b''
+        if 'content-length' not in headers:
+            raise HTTPError(411, "Content-Length is required")
+
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise HTTPError(400, "Content-Length must be an integer")
+        if length > self.max_body:
+            raise HTTPError(413, f"Body larger than {self.max_body} bytes")
+        return await reader.readexactly(length)
+
+    async def _respond(self, writer, status, payload, content_type, keep_alive):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        body = body.encode('utf-8')
+
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if status == 503:
+            head.append("Retry-After: 1")
+
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP car color detection service")
+    parser.add_argument('--host', default=config.SERVER_HOST, help="Interface to listen on")
+    parser.add_argument('--port', type=int, default=config.SERVER_PORT, help="Port to listen on")
+    parser.add_argument('--workers', type=int, default=config.SERVER_WORKERS,
+                        help="Inference threads; model calls take turns, decoding and color analysis overlap")
+    parser.add_argument('--max-queue', type=int, default=config.SERVER_MAX_QUEUE,
+                        help="Requests waiting for inference before new ones get 503")
+    parser.add_argument('--micro-batch', action='store_true', default=config.SERVER_MICRO_BATCH,
+                        help="Group concurrent requests into batched detector calls")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Analyse every request, even repeated frames (use for load tests)")
+    args = parser.parse_args()
+
+    from car_color_detection import CarColorDetector
+
+    detector = CarColorDetector()
+    if args.no_cache:
+        detector.result_cache = None
+    server = InferenceServer(detector, args.workers, args.max_queue, micro_batch=args.micro_batch)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,6 @@ def check_imports():
         'numpy': 'numpy',
         'PIL': 'Pillow',
         'sklearn': 'scikit-learn',
-        'webcolors': 'webcolors',
         'ultralytics': 'ultralytics',
         'tkinter': 'tkinter (built-in)'
     }
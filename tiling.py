@@ -0,0 +1,138 @@
+"""
+Tiled Inference for Car Color Detection System
+Large images are split into overlapping tiles that are sent to the backend
+as one batch, so distant vehicles keep their pixels instead of being
+shrunk to the model input size; the boxes of all tiles are merged back
+with cross-tile NMS before color analysis
+"""
+
+import numpy as np
+
+import config
+from backends import Detections, non_max_suppression
+
+# Boxes this close to a tile edge inside the image are treated as cut off by it
+EDGE_MARGIN = 2
+
+
+class TiledInference:
+    """Detect objects on overlapping tiles of large images"""
+
+    def __init__(self, tile_size=None, overlap=None, min_side=None, full_frame=None, batch_size=None):
+        self.tile_size = tile_size or config.TILE_SIZE
+        self.overlap = config.TILE_OVERLAP if overlap is None else overlap
+        self.min_side = config.TILE_MIN_SIDE if min_side is None else min_side
+        self.full_frame = config.TILE_FULL_FRAME if full_frame is None else full_frame
+        self.batch_size = batch_size or config.TILE_BATCH_SIZE
+        if not 0 <= self.overlap < self.tile_size / 2:
+            raise ValueError(f"Tile overlap must be below half the tile size ({self.tile_size / 2:g})")
+
+    @property
+    def input_size(self):
+        """Model input size for tiles, so they are not scaled by the backend"""
+        return int(np.ceil(self.tile_size / 32)) * 32
+
+    def applies(self, image):
+        """True if an image is large enough to be tiled"""
+        return max(image.shape[:2]) > max(self.min_side, self.tile_size)
+
+    def tiles(self, image_shape):
+        """
+        Return the tiles of an image, spread evenly so the last one ends at the edge
+
+        Neighbouring tiles overlap by at least self.overlap pixels.
+
+        Returns:
+            List of (x1, y1, x2, y2) in image coordinates
+        """
+        height, width = image_shape[:2]
+        xs = self._starts(width)
+        ys = self._starts(height)
+        return [(x, y, min(x + self.tile_size, width), min(y + self.tile_size, height)) for y in ys for x in xs]
+
+    def _starts(self, length):
+        if length <= self.tile_size:
+            return [0]
+        count = int(np.ceil((length - self.overlap) / (self.tile_size - self.overlap)))
+        return [int(round(start)) for start in np.linspace(0, length - self.tile_size, count)]
+
+    def detect(self, backend, images, conf=None, classes=None, input_size=None):
+        """
+        Detect objects in a list of BGR images, tiling the large ones
+
+        The tiles of every image go to the backend in batches of
+        self.batch_size. With full_frame, large images also get one
+        ordinary pass at input_size for vehicles bigger than the overlap.
+
+        Returns:
+            List of Detections, one per image, in image coordinates
+        """
+        tiled = [index for index, image in enumerate(images) if self.applies(image)]
+        if not tiled:
+            return backend.detect(images, conf=conf, classes=classes, input_size=input_size)
+
+        # Small images and the full-frame passes share one ordinary call
+        whole = [index for index in range(len(images)) if self.full_frame or index not in tiled]
+        results = dict(zip(whole, backend.detect([images[index] for index in whole], conf=conf,
+                                                 classes=classes, input_size=input_size))) if whole else {}
+
+        crops, owners = [], []
+        for index in tiled:
+            for tile in self.tiles(images[index].shape):
+                x1, y1, x2, y2 = tile
+                crops.append(images[index][y1:y2, x1:x2])
+                owners.append((index, tile))
+
+        pieces = {index: [] for index in tiled}
+        for start in range(0, len(crops), self.batch_size):
+            found = backend.detect(crops[start:start + self.batch_size], conf=conf, classes=classes,
+                                   input_size=self.input_size)
+            for (index, tile), detections in zip(owners[start:start + self.batch_size], found):
+                pieces[index].append(self._from_tile(detections, tile, images[index].shape))
+
+        for index in tiled:
+            if index in results:
+                pieces[index].append(results[index])
+            results[index] = self.merge(pieces[index])
+        return [results[index] for index in range(len(images))]
+
+    def _from_tile(self, detections, tile, image_shape):
+        """
+        Move a tile's Detections to image coordinates, dropping boxes cut off by the tile
+
+        A box cut off by an edge inside the image that is narrower than the
+        overlap there is seen whole by the neighbouring tile. With full_frame,
+        wider cut-off boxes are dropped too and left to the full-frame pass.
+        """
+        x1, y1, x2, y2 = tile
+        height, width = image_shape[:2]
+        boxes = detections.boxes + np.array([x1, y1, x1, y1], dtype=np.float32)
+        limit = np.inf if self.full_frame else self.overlap
+
+        extent_x = boxes[:, 2] - boxes[:, 0]
+        extent_y = boxes[:, 3] - boxes[:, 1]
+        cut = np.zeros(len(boxes), dtype=bool)
+        if x1 > 0:
+            cut |= (boxes[:, 0] <= x1 + EDGE_MARGIN) & (extent_x < limit)
+        if x2 < width:
+            cut |= (boxes[:, 2] >= x2 - EDGE_MARGIN) & (extent_x < limit)
+        if y1 > 0:
+            cut |= (boxes[:, 1] <= y1 + EDGE_MARGIN) & (extent_y < limit)
+        if y2 < height:
+            cut |= (boxes[:, 3] >= y2 - EDGE_MARGIN) & (extent_y < limit)
+
+        keep = ~cut
+        return Detections(boxes[keep], detections.confidences[keep], detections.class_ids[keep])
+
+    @staticmethod
+    def merge(pieces):
+        """Merge the Detections of all tiles of one image with cross-tile NMS"""
+        boxes = np.concatenate([piece.boxes for piece in pieces])
+        confidences = np.concatenate([piece.confidences for piece in pieces])
+        class_ids = np.concatenate([piece.class_ids for piece in pieces])
+        keep = non_max_suppression(boxes, confidences, class_ids, config.NMS_IOU_THRESHOLD)
+        return Detections(boxes[keep], confidences[keep], class_ids[keep])
+
+    def __repr__(self):
+        return (f"TiledInference(tile_size={self.tile_size}, overlap={self.overlap}, "
+                f"min_side={self.min_side}, full_frame={self.full_frame})")
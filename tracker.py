@@ -0,0 +1,167 @@
+"""
+Lightweight multi-object tracker for Car Color Detection System
+Assigns stable IDs to cars across frames so each car's color can be cached
+and every vehicle is counted once per session
+"""
+
+import numpy as np
+
+import config
+
+
+class Track:
+    """A car followed across frames"""
+
+    def __init__(self, track_id, box, frame):
+        self.track_id = track_id
+        self.box = box
+        self.hits = 1
+        self.misses = 0
+        self.last_frame = frame
+        self.counted = False
+
+        # Cached color, refreshed every COLOR_REFRESH_FRAMES or when the box changes a lot
+        self.color_bgr = None
+        self.color_name = None
+        self.color_frame = None
+        self.color_box = None
+
+
+def box_iou(boxes_a, boxes_b):
+    """Return the IoU matrix between two arrays of (x1, y1, x2, y2) boxes"""
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)[None, :, :]
+
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+class VehicleTracker:
+    """IoU tracker with a centroid-distance second pass, CPU only
+
+    Detections are first matched to tracks greedily by IoU. Tracks and
+    detections left over are then matched by centroid distance relative to
+    the box size, which keeps IDs on fast cars whose boxes no longer
+    overlap between frames.
+    """
+
+    # Minimum 1 - centroid distance / box diagonal for the second pass
+    CENTROID_MATCH_THRESHOLD = 0.5
+
+    def __init__(self, iou_threshold=None, max_age=None, min_hits=None,
+                 color_refresh_frames=None, color_refresh_iou=None):
+        self.iou_threshold = iou_threshold or config.TRACK_IOU_THRESHOLD
+        self.max_age = max_age or config.TRACK_MAX_AGE
+        self.min_hits = min_hits or config.TRACK_MIN_HITS
+        self.color_refresh_frames = color_refresh_frames or config.COLOR_REFRESH_FRAMES
+        self.color_refresh_iou = color_refresh_iou or config.COLOR_REFRESH_IOU
+
+        self.tracks = []
+        self.frame_count = 0
+        self.unique_counts = {}
+        self._next_id = 1
+
+    def update(self, boxes):
+        """
+        Match one frame's car boxes to tracks
+
+        Args:
+            boxes: List of (x1, y1, x2, y2, ...) car boxes
+
+        Returns:
+            List of Track objects, one per box
+        """
+        self.frame_count += 1
+        boxes = [tuple(box[:4]) for box in boxes]
+        assigned = [None] * len(boxes)
+
+        unmatched_tracks = list(range(len(self.tracks)))
+        unmatched_boxes = list(range(len(boxes)))
+
+        if self.tracks and boxes:
+            iou = box_iou([track.box for track in self.tracks], boxes)
+            self._greedy_match(iou, self.iou_threshold, boxes, unmatched_tracks, unmatched_boxes, assigned)
+
+            if unmatched_tracks and unmatched_boxes:
+                closeness = self._centroid_closeness([self.tracks[t].box for t in unmatched_tracks],
+                                                     [boxes[b] for b in unmatched_boxes])
+                scores = np.zeros((len(self.tracks), len(boxes)), dtype=np.float32)
+                scores[np.ix_(unmatched_tracks, unmatched_boxes)] = closeness
+                self._greedy_match(scores, self.CENTROID_MATCH_THRESHOLD, boxes, unmatched_tracks, unmatched_boxes, assigned)
+
+        for b in unmatched_boxes:
+            track = Track(self._next_id, boxes[b], self.frame_count)
+            self._next_id += 1
+            self.tracks.append(track)
+            assigned[b] = track
+
+        for t in unmatched_tracks:
+            self.tracks[t].misses += 1
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_age]
+
+        for track in assigned:
+            self._maybe_count(track)
+        return assigned
+
+    def needs_color(self, track):
+        """Return True if a track's cached color is missing or stale"""
+        if track.color_frame is None:
+            return True
+        if self.frame_count - track.color_frame >= self.color_refresh_frames:
+            return True
+        return box_iou([track.box], [track.color_box])[0, 0] < self.color_refresh_iou
+
+    def mark_color_pending(self, track):
+        """Record that a color refresh was requested for a track on this frame"""
+        track.color_frame = self.frame_count
+        track.color_box = track.box
+
+    def set_color(self, track, color_bgr, color_name):
+        """Cache a track's dominant color and classified color name"""
+        track.color_bgr = color_bgr
+        track.color_name = color_name
+        self._maybe_count(track)
+
+    def _greedy_match(self, scores, threshold, boxes, unmatched_tracks, unmatched_boxes, assigned):
+        """Assign the highest scoring track/box pairs first"""
+        for flat in np.argsort(scores, axis=None)[::-1]:
+            t, b = (int(i) for i in np.unravel_index(flat, scores.shape))
+            if scores[t, b] < threshold:
+                break
+            if t not in unmatched_tracks or b not in unmatched_boxes:
+                continue
+
+            track = self.tracks[t]
+            track.box = boxes[b]
+            track.hits += 1
+            track.misses = 0
+            track.last_frame = self.frame_count
+            assigned[b] = track
+
+            unmatched_tracks.remove(t)
+            unmatched_boxes.remove(b)
+
+    def _centroid_closeness(self, track_boxes, boxes):
+        """Return 1 - centroid distance / track box diagonal, clipped at 0"""
+        track_boxes = np.asarray(track_boxes, dtype=np.float32)
+        boxes = np.asarray(boxes, dtype=np.float32)
+
+        track_centers = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+        diagonals = np.hypot(track_boxes[:, 2] - track_boxes[:, 0], track_boxes[:, 3] - track_boxes[:, 1])
+
+        distance = np.linalg.norm(track_centers[:, None, :] - centers[None, :, :], axis=2)
+        return np.clip(1 - distance / np.maximum(diagonals[:, None], 1), 0, None)
+
+    def _maybe_count(self, track):
+        """Count a track once it has been seen min_hits times and has a color"""
+        if not track.counted and track.hits >= self.min_hits and track.color_name is not None:
+            track.counted = True
+            self.unique_counts[track.color_name] = self.unique_counts.get(track.color_name, 0) + 1
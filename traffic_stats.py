@@ -0,0 +1,134 @@
+"""
+Rolling Traffic Statistics for Car Color Detection System
+Per-second totals of cars per color, people and confidence are kept in one
+fixed-size NumPy ring buffer, with a running sum per time window, so
+memory stays flat however long the webcam runs
+"""
+
+import threading
+import time
+
+import numpy as np
+
+import config
+
+# Fixed columns of a bucket, followed by cars per color and new cars per color
+FRAMES, PEOPLE, CAR_CONFIDENCE, PERSON_CONFIDENCE, CARS = range(5)
+
+
+class TrafficStatistics:
+    """Rolling totals over the windows in config.TRAFFIC_STATS_WINDOWS"""
+
+    def __init__(self, windows=None, color_names=None):
+        self.windows = dict(windows or config.TRAFFIC_STATS_WINDOWS)
+        names = color_names or [name.rstrip('0123456789') for name in config.COLOR_RANGES]
+        self.color_names = list(dict.fromkeys(list(names) + ['other']))
+        self._color_index = {name: index for index, name in enumerate(self.color_names)}
+
+        n_colors = len(self.color_names)
+        self._colors_start = CARS + 1
+        self._new_start = self._colors_start + n_colors
+        columns = self._new_start + n_colors
+
+        # One bucket per second of the longest window, plus one running sum per window
+        self._spans = np.array(list(self.windows.values()), dtype=np.int64)
+        self._buckets = np.zeros((int(self._spans.max()), columns), dtype=np.float64)
+        self._sums = np.zeros((len(self._spans), columns), dtype=np.float64)
+        self._second = None
+        self._last_unique = {}
+        self._lock = threading.Lock()
+
+    def add(self, analysis_results, timestamp=None):
+        """
+        Add one frame's analysis_results
+
+        Args:
+            analysis_results: Results dict from CarColorDetector
+            timestamp: Time of the frame in seconds (None for now)
+        """
+        row = np.zeros(self._buckets.shape[1], dtype=np.float64)
+        row[FRAMES] = 1
+        row[PEOPLE] = analysis_results['total_people']
+        row[CARS] = analysis_results['total_cars']
+        row[CAR_CONFIDENCE] = analysis_results['avg_car_confidence'] * analysis_results['total_cars']
+        row[PERSON_CONFIDENCE] = analysis_results['avg_person_confidence'] * analysis_results['total_people']
+        for color, count in analysis_results['car_colors'].items():
+            row[self._colors_start + self._color_column(color)] += count
+
+        with self._lock:
+            # With tracking, newly counted unique vehicles are recorded as well
+            unique = analysis_results.get('unique_car_colors')
+            if unique is not None:
+                for color, count in unique.items():
+                    new = count - self._last_unique.get(color, 0)
+                    if new > 0:
+                        row[self._new_start + self._color_column(color)] += new
+                self._last_unique = dict(unique)
+
+            self._advance(int(time.time() if timestamp is None else timestamp))
+            self._buckets[self._second % len(self._buckets)] += row
+            self._sums += row
+
+    def _color_column(self, color):
+        """Offset of a color within the color columns, unknown colors count as other"""
+        return self._color_index.get(color, self._color_index['other'])
+
+    def _advance(self, second):
+        """Move the ring buffer forward to second, expiring buckets that leave each window"""
+        if self._second is None or second - self._second >= len(self._buckets):
+            self._buckets[:] = 0
+            self._sums[:] = 0
+            self._second = second
+            return
+
+        while self._second < second:
+            self._second += 1
+            for window, span in enumerate(self._spans):
+                self._sums[window] -= self._buckets[(self._second - span) % len(self._buckets)]
+            self._buckets[self._second % len(self._buckets)] = 0
+
+            # Re-add the running sums once per revolution so float error cannot build up over days
+            if self._second % len(self._buckets) == 0:
+                self._resum()
+
+    def _resum(self):
+        order = (np.arange(len(self._buckets)) + self._second + 1) % len(self._buckets)
+        ordered = self._buckets[order]  # Oldest second first
+        for window, span in enumerate(self._spans):
+            self._sums[window] = ordered[len(ordered) - span:].sum(axis=0)
+
+    def window(self, name, now=None):
+        """
+        Return the raw totals of one window
+
+        Returns:
+            Dictionary with frames, people, cars, car/person confidence sums,
+            car_colors and new_car_colors
+        """
+        with self._lock:
+            if self._second is not None:
+                self._advance(max(int(time.time() if now is None else now), self._second))
+            sums = self._sums[list(self.windows).index(name)].copy()
+
+        colors = sums[self._colors_start:self._new_start]
+        new = sums[self._new_start:]
+        return {
+            'frames': round(sums[FRAMES]),
+            'people': round(sums[PEOPLE]),
+            'cars': round(sums[CARS]),
+            'car_confidence_sum': float(sums[CAR_CONFIDENCE]),
+            'person_confidence_sum': float(sums[PERSON_CONFIDENCE]),
+            'car_colors': {name: round(count) for name, count in zip(self.color_names, colors) if round(count)},
+            'new_car_colors': {name: round(count) for name, count in zip(self.color_names, new) if round(count)}
+        }
+
+    def snapshot(self, now=None):
+        """Return the totals of every window, keyed by window name"""
+        return {name: self.window(name, now) for name in self.windows}
+
+    def reset(self):
+        with self._lock:
+            self._buckets[:] = 0
+            self._sums[:] = 0
+            self._second = None
+            self._last_unique = {}
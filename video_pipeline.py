@@ -0,0 +1,303 @@
+"""
+Pipelined video file processing for Car Color Detection System
+Decoding, YOLO inference, color analysis and annotation/encoding run as
+separate threads connected by bounded queues, so decoding and encoding
+overlap with inference
+
+Usage:
+    python video_pipeline.py traffic.mp4 -o annotated.mp4 --stride 2 --start 30 --end 90
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+
+import cv2
+
+import config
+from renderer import render_detections
+
+STAGES = ('decode', 'inference', 'color', 'annotate', 'encode')
+
+# Marks the end of the stream on every queue
+_END = None
+
+
+class VideoPipeline:
+    """Process a video file through decode -> inference -> color -> annotate/encode stages"""
+
+    def __init__(self, detector, source, output_path=None, stride=1, start=None, end=None,
+                 batch_size=1, queue_size=None, on_result=None):
+        """
+        Args:
+            detector: CarColorDetector instance
+            source: Video file path
+            output_path: Annotated video output path (None to skip encoding)
+            stride: Process every stride-th frame
+            start: Start time in seconds (None for the beginning)
+            end: End time in seconds (None for the end of the video)
+            batch_size: Frames sent to YOLO per call
+            queue_size: Maximum frames waiting between two stages
+            on_result: Called as on_result(frame_index, time_sec, analysis_results)
+        """
+        self.detector = detector
+        self.source = source
+        self.output_path = output_path
+        self.stride = max(1, stride)
+        self.start = start
+        self.end = end
+        self.batch_size = max(1, batch_size)
+        self.queue_size = queue_size or config.VIDEO_QUEUE_SIZE
+        self.on_result = on_result
+
+        self.stage_times = dict.fromkeys(STAGES, 0.0)
+        self.frames_processed = 0
+        self._stop = threading.Event()
+        self._errors = []
+
+    def run(self):
+        """Run the pipeline to completion and return the stats dict"""
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            raise IOError(f"Could not open video: {self.source}")
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or config.WEBCAM_FPS
+        decoded = queue.Queue(self.queue_size)
+        inferred = queue.Queue(self.queue_size)
+        analyzed = queue.Queue(self.queue_size)
+
+        threads = [
+            threading.Thread(target=self._guard, args=(self._decode, cap, fps, decoded), daemon=True),
+            threading.Thread(target=self._guard, args=(self._infer, decoded, inferred), daemon=True),
+            threading.Thread(target=self._guard, args=(self._analyze, inferred, analyzed), daemon=True),
+            threading.Thread(target=self._guard, args=(self._annotate, analyzed, fps / self.stride), daemon=True)
+        ]
+
+        if config.ENABLE_TRACKING:
+            self.detector.start_tracking()
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.1)
+        except KeyboardInterrupt:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        finally:
+            cap.release()
+            self.detector.stop_tracking()
+
+        elapsed = time.perf_counter() - start
+        if self._errors:
+            raise self._errors[0]
+
+        return self.stats(elapsed)
+
+    def stats(self, elapsed):
+        """Return end-to-end throughput and the time spent in each stage"""
+        frames = self.frames_processed
+        return {
+            'frames': frames,
+            'elapsed_sec': elapsed,
+            'fps': frames / elapsed if elapsed > 0 else 0.0,
+            'stage_sec': dict(self.stage_times),
+            'stage_ms_per_frame': {stage: (seconds * 1000 / frames if frames else 0.0)
+                                   for stage, seconds in self.stage_times.items()}
+        }
+
+    def _guard(self, stage, *args):
+        """Run a stage, recording any error and stopping the other stages"""
+        try:
+            stage(*args)
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+
+    def _put(self, q, item):
+        """Put an item on a bounded queue unless the pipeline is stopping"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        """Get an item from a queue, returning _END if the pipeline is stopping"""
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _decode(self, cap, fps, out):
+        if self.start:
+            cap.set(cv2.CAP_PROP_POS_MSEC, self.start * 1000)
+        frame_index = first_frame = int(cap.get(cv2.CAP_PROP_POS_FRAMES))
+
+        while not self._stop.is_set():
+            started = time.perf_counter()
+
+            # Skipped frames are only grabbed, never decoded
+            while (frame_index - first_frame) % self.stride:
+                if not cap.grab():
+                    break
+                frame_index += 1
+
+            ret, frame = cap.read()
+            self.stage_times['decode'] += time.perf_counter() - started
+
+            time_sec = frame_index / fps
+            if not ret or (self.end is not None and time_sec > self.end):
+                break
+
+            if not self._put(out, (frame_index, time_sec, frame)):
+                return
+            frame_index += 1
+
+        self._put(out, _END)
+
+    def _infer(self, inp, out):
+        finished = False
+
+        while not finished:
+            batch = []
+            while len(batch) < self.batch_size:
+                item = self._get(inp) if not batch else self._get_nowait(inp)
+                if item is _END:
+                    finished = True
+                    break
+                if item is False:
+                    break
+                batch.append(item)
+
+            if batch:
+                started = time.perf_counter()
+                frames = [frame for _, _, frame in batch]
+                working, transforms = self.detector.prepare_images(frames)
+                results = self.detector.detect_objects(working, self.detector.inference_size(frames))
+                self.stage_times['inference'] += time.perf_counter() - started
+
+                if not self._put(out, (batch, working, transforms, results)):
+                    return
+
+        self._put(out, _END)
+
+    def _get_nowait(self, q):
+        """Return the next queued item, or False if none is ready yet"""
+        try:
+            return q.get_nowait()
+        except queue.Empty:
+            return False
+
+    def _analyze(self, inp, out):
+        while True:
+            item = self._get(inp)
+            if item is _END:
+                break
+
+            batch, working, transforms, results = item
+            started = time.perf_counter()
+            # The tracker moves on with the next batch while this one is
+            # annotated, so each frame carries its own copy of the counts
+            analyses, unique_counts = self.detector.analyze_detections(working, results)
+            self.detector.restore_coordinates(analyses, transforms, [frame for _, _, frame in batch])
+            self.stage_times['color'] += time.perf_counter() - started
+
+            for frame_item, detections, counts in zip(batch, analyses, unique_counts):
+                if not self._put(out, (frame_item, detections, counts)):
+                    return
+
+        self._put(out, _END)
+
+    def _annotate(self, inp, output_fps):
+        writer = None
+
+        try:
+            while True:
+                item = self._get(inp)
+                if item is _END:
+                    break
+
+                (frame_index, time_sec, frame), detections, unique_counts = item
+                started = time.perf_counter()
+                results = self.detector.summarize(detections, unique_counts)
+                if self.output_path:
+                    render_detections(frame, detections, results, zones=self.detector.zones)
+                self.stage_times['annotate'] += time.perf_counter() - started
+
+                if self.output_path:
+                    started = time.perf_counter()
+                    if writer is None:
+                        height, width = frame.shape[:2]
+                        fourcc = cv2.VideoWriter_fourcc(*config.VIDEO_FOURCC)
+                        writer = cv2.VideoWriter(self.output_path, fourcc, output_fps, (width, height))
+                    writer.write(frame)
+                    self.stage_times['encode'] += time.perf_counter() - started
+
+                self.frames_processed += 1
+                if self.on_result:
+                    self.on_result(frame_index, time_sec, results)
+        finally:
+            if writer is not None:
+                writer.release()
+
+
+def print_stats(stats):
+    """Print pipeline throughput and per-stage timings"""
+    print(f"Frames processed: {stats['frames']}")
+    print(f"Elapsed: {stats['elapsed_sec']:.2f} s ({stats['fps']:.2f} frames/sec end to end)")
+    print("Time per stage:")
+    for stage in STAGES:
+        print(f"  {stage:<10} {stats['stage_sec'][stage]:>8.2f} s "
+              f"({stats['stage_ms_per_frame'][stage]:.2f} ms/frame)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipelined car color detection for video files")
+    parser.add_argument('source', help="Input video file")
+    parser.add_argument('-o', '--output', default=None, help="Annotated output video")
+    parser.add_argument('-r', '--results', default=None, help="Per-frame results JSONL file")
+    parser.add_argument('--stride', type=int, default=1, help="Process every Nth frame")
+    parser.add_argument('--start', type=float, default=None, help="Start time in seconds")
+    parser.add_argument('--end', type=float, default=None, help="End time in seconds")
+    parser.add_argument('-b', '--batch-size', type=int, default=1, help="Frames per YOLO call")
+    args = parser.parse_args()
+
+    from batch_process import serialize_results
+    from car_color_detection import CarColorDetector
+    from zones import zones_for
+
+    results_file = open(args.results, 'w', encoding='utf-8') if args.results else None
+
+    def write_result(frame_index, time_sec, results):
+        if results_file:
+            record = {'frame': frame_index, 'time_sec': round(time_sec, 3)}
+            record.update(serialize_results(results))
+            results_file.write(json.dumps(record) + '\n')
+
+    # Zones configured for this video file in config.ZONES
+    detector = CarColorDetector()
+    detector.zones = zones_for(args.source)
+
+    pipeline = VideoPipeline(detector, args.source, args.output, stride=args.stride,
+                             start=args.start, end=args.end, batch_size=args.batch_size,
+                             on_result=write_result)
+    try:
+        print_stats(pipeline.run())
+    finally:
+        if results_file:
+            results_file.close()
+
+
+if __name__ == "__main__":
+    main()
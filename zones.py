@@ -0,0 +1,112 @@
+"""
+Region-of-Interest Zones for Car Color Detection System
+Polygon zones per camera, given as fractions of the frame size. Inference
+runs on the bounding crop of the zones only, and every detection is
+assigned to the zone that contains its bottom-center point
+
+Example (config.py):
+    ZONES = {
+        'webcam 0': [
+            {'name': 'stop line', 'points': [(0.1, 0.6), (0.6, 0.6), (0.6, 0.8), (0.1, 0.8)]},
+            {'name': 'crosswalk', 'points': [(0.1, 0.8), (0.9, 0.8), (0.9, 0.95), (0.1, 0.95)]}
+        ]
+    }
+"""
+
+import cv2
+import numpy as np
+
+import config
+
+
+class Zone:
+    """One named polygon, with points as (x, y) fractions of the frame size"""
+
+    def __init__(self, name, points):
+        self.name = name
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        if len(self.points) < 3:
+            raise ValueError(f"Zone {name!r} needs at least 3 points")
+
+    def polygon(self, image_shape):
+        """Return the polygon in pixel coordinates of an image"""
+        height, width = image_shape[:2]
+        return (self.points * [width, height]).astype(np.int32)
+
+    def __repr__(self):
+        return f"Zone({self.name!r}, {self.points.tolist()})"
+
+
+class ZoneSet:
+    """The active zones of one camera"""
+
+    def __init__(self, zones, margin=None):
+        self.zones = [zone if isinstance(zone, Zone) else Zone(zone['name'], zone['points']) for zone in zones]
+        self.margin = config.ZONE_CROP_MARGIN if margin is None else margin
+        if not self.zones:
+            raise ValueError("A ZoneSet needs at least one zone")
+
+    def crop_box(self, image_shape):
+        """
+        Return the bounding box of all zones in pixels, padded by margin
+
+        Vehicles that only reach into a zone are still seen whole.
+
+        Returns:
+            tuple: (x1, y1, x2, y2) clipped to the image
+        """
+        height, width = image_shape[:2]
+        points = np.concatenate([zone.polygon(image_shape) for zone in self.zones])
+        x1, y1 = points.min(axis=0) - self.margin
+        x2, y2 = points.max(axis=0) + self.margin
+        return (int(max(x1, 0)), int(max(y1, 0)), int(min(x2, width)), int(min(y2, height)))
+
+    def assign(self, detections, image_shape):
+        """
+        Set each detection's 'zone' and drop the detections outside every zone, in place
+
+        Detections are placed by the bottom-center of their box, where the
+        vehicle or person touches the ground; the first matching zone wins.
+        """
+        polygons = [(zone.name, zone.polygon(image_shape)) for zone in self.zones]
+        kept = []
+        for detection in detections:
+            x1, _, x2, y2 = detection['box']
+            point = ((x1 + x2) / 2, float(y2))
+            for name, polygon in polygons:
+                if cv2.pointPolygonTest(polygon, point, False) >= 0:
+                    detection['zone'] = name
+                    kept.append(detection)
+                    break
+        detections[:] = kept
+
+    def summarize(self, detections):
+        """
+        Count cars per color and people in each zone
+
+        Returns:
+            Dictionary of zone name to {'cars', 'blue_cars', 'car_colors', 'people'}
+        """
+        counts = {zone.name: {'cars': 0, 'blue_cars': 0, 'car_colors': {}, 'people': 0} for zone in self.zones}
+        for detection in detections:
+            zone = counts.get(detection.get('zone'))
+            if zone is None:
+                continue
+            if detection['class_name'] == 'person':
+                zone['people'] += 1
+            else:
+                zone['cars'] += 1
+                color = detection['color_name']
+                if color is not None:
+                    zone['car_colors'][color] = zone['car_colors'].get(color, 0) + 1
+                    zone['blue_cars'] += color == 'blue'
+        return counts
+
+    def __repr__(self):
+        return f"ZoneSet({self.zones}, margin={self.margin})"
+
+
+def zones_for(source):
+    """Return the ZoneSet configured for a camera or video in config.ZONES, or None"""
+    zones = config.ZONES.get(source)
+    return ZoneSet(zones) if zones else None